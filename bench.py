@@ -0,0 +1,419 @@
+"""Synthetic-load benchmarks for TaskBot.
+
+Builds a throwaway database of generated tasks and times the hot paths:
+
+  tick      one check_reminders pass over everything due (wall time, peak memory)
+  insert    add_task throughput against the populated table
+  handlers  p50/p99 of /list, /info and /done, run through the real handlers
+  logging   log_debug_event cost per call and the background writer's drain rate
+
+Results are written as JSON (stdout, or --out) so runs on different commits
+can be compared:
+
+    python bench.py --tasks 100000 --chats 1000 --due burst --out before.json
+    python bench.py --tasks 1000000 --db /tmp/bench-1m.db --reuse --only tick
+
+Telegram is never contacted: outgoing messages go to a sink that counts them.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SUITES = ("tick", "insert", "handlers", "logging")
+DUE_DISTRIBUTIONS = {
+    "uniform": "due times spread from a day ago to 30 days ahead",
+    "burst": "like uniform, plus --burst-frac of all tasks due in the same minute",
+    "overdue": "every task already due",
+}
+GENERATE_CHUNK = 10000
+
+bot = None  # imported in main() once DB_PATH/DEBUG_LOG_JSONL point at scratch files
+
+
+def percentiles(samples_s):
+    samples = sorted(samples_s)
+    if not samples:
+        return {"n": 0}
+    pick = lambda q: samples[min(len(samples) - 1, int(len(samples) * q))] * 1000
+    return {
+        "n": len(samples),
+        "p50_ms": round(pick(0.50), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+# — Synthetic data —
+def due_time(dist, now, rng, burst_frac):
+    if dist == "overdue":
+        return now - rng.uniform(0, 86400)
+    if dist == "burst" and rng.random() < burst_frac:
+        return now - rng.uniform(0, 60)
+    return now + rng.uniform(-86400, 30 * 86400)
+
+
+def generate_rows(args, rng):
+    now = time.time()
+    sequences = {}
+    for _ in range(args.tasks):
+        chat = rng.randrange(args.chats)
+        # Odd-numbered chats are groups (negative ids) so both send rates are exercised
+        chat_id = -(1000 + chat) if chat % 2 else 1000 + chat
+        user_id = 1000 + chat * args.users_per_chat + rng.randrange(args.users_per_chat)
+        utid = sequences[chat_id, user_id] = sequences.get((chat_id, user_id), 0) + 1
+        due = int(due_time(args.due, now, rng, args.burst_frac))
+        is_done = rng.random() < args.done_frac
+        interval = 15 if rng.random() < args.question_frac else 0
+        next_q = min(due, int(now) + rng.randrange(interval * 60)) if interval else None
+        iso = datetime.fromtimestamp(due).isoformat()
+        yield (
+            chat_id, user_id, utid, f"Synthetic task {utid} for user {user_id}", iso, int(is_done),
+            interval, int(bool(interval)), datetime.fromtimestamp(next_q).isoformat() if next_q else None, iso,
+            f"topic{rng.randrange(10)}", None, due, due, next_q,
+            int(now) - rng.randrange(60 * 86400) if is_done else None,
+        )
+
+
+def build_database(args):
+    """Create the schema through init_db, then bulk-load generated tasks."""
+    started = time.perf_counter()
+    bot.init_db()
+    bot.run_online_migrations()
+    rng = random.Random(args.seed)
+    conn = bot.get_db()
+    with conn:
+        # Loading without indexes and building them afterwards is much faster
+        for name in bot.TASK_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        rows = generate_rows(args, rng)
+        while chunk := [row for _, row in zip(range(GENERATE_CHUNK), rows)]:
+            conn.executemany(
+                "INSERT INTO tasks (chat_id, user_id, user_task_id, description, remind_at, is_done, "
+                "question_interval, question_enabled, next_question_at, next_reminder_at, topic, subject, "
+                "remind_ts, next_reminder_ts, next_question_ts, done_ts) "
+                "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                chunk
+            )
+        bot.sync_task_indexes(conn)
+        bot.sync_task_sequences(conn)
+    conn.execute("ANALYZE")
+    return time.perf_counter() - started
+
+
+def describe_dataset(build_s):
+    conn = bot.get_db()
+    # Under WAL most freshly written pages are still in -wal; fold them in
+    # so db_bytes is the real database size
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    total, active, chats = conn.execute(
+        "SELECT COUNT(*), SUM(is_done=0), COUNT(DISTINCT chat_id) FROM tasks"
+    ).fetchone()
+    return {
+        "tasks": total,
+        "active": active or 0,
+        "chats": chats,
+        "due_now": len(bot.fetch_due_tasks(conn, datetime.now())),
+        "db_bytes": os.path.getsize(bot.DB_PATH),
+        "build_s": round(build_s, 2) if build_s is not None else None,
+    }
+
+
+# — Sinks standing in for Telegram —
+class SinkBot:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent += 1
+
+
+class SinkMessage:
+    def __init__(self, text, chat_id):
+        self.text = text
+        self.chat_id = chat_id
+        self.replies = 0
+
+    async def reply_text(self, text, **kwargs):
+        self.replies += 1
+        return self
+
+
+def command_update(text, chat_id, user_id):
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id, username=None),
+        effective_chat=SimpleNamespace(id=chat_id, type="private" if chat_id > 0 else "group"),
+        message=SinkMessage(text, chat_id),
+        callback_query=None,
+    )
+
+
+def command_context(text):
+    return SimpleNamespace(args=text.split()[1:], user_data={}, bot=None)
+
+
+# — Suites —
+async def bench_tick(args):
+    """Time check_reminders over the current due set, restoring it between runs."""
+    loop = asyncio.get_running_loop()
+    conn = bot.get_db()
+    now = datetime.now()
+    now_ts, now_str = bot.to_epoch(now), now.isoformat()
+    snapshot = conn.execute(
+        "SELECT next_reminder_at, next_reminder_ts, next_question_at, next_question_ts, id FROM tasks "
+        f"WHERE id IN (SELECT id FROM ({bot.DUE_TASKS_SQL}))",
+        (now_ts, now_ts, now_str, now_str)
+    ).fetchall()
+
+    async def one_tick(trace_memory):
+        with conn:
+            conn.executemany(
+                "UPDATE tasks SET next_reminder_at=?, next_reminder_ts=?, next_question_at=?, next_question_ts=? "
+                "WHERE id=?",
+                snapshot
+            )
+        sink = SinkBot()
+        # Unbounded outbox: measure the tick, not the send-rate throttling
+        bot.outbox = bot.MessageDispatcher(max_pending=sys.maxsize)
+        bot.outbox.start(sink)
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        await loop.run_in_executor(None, bot.check_reminders)
+        elapsed = time.perf_counter() - started
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        messages = sink.sent + bot.outbox.pending
+        await bot.outbox.stop(timeout=0)
+        return elapsed, messages, peak
+
+    runs, messages = [], 0
+    for _ in range(args.repeat):
+        elapsed, messages, _ = await one_tick(False)
+        runs.append(elapsed)
+    # Separate run: tracemalloc slows everything down, so it never feeds the timings
+    _, _, peak = await one_tick(True)
+    return {
+        "due_rows": len(snapshot),
+        "messages": messages,
+        "runs_ms": [round(r * 1000, 2) for r in runs],
+        **percentiles(runs),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_insert(args):
+    rng = random.Random(args.seed + 1)
+    due = datetime.now() + timedelta(days=1)
+    timings = []
+    started = time.perf_counter()
+    for i in range(args.inserts):
+        chat = rng.randrange(args.chats)
+        user_id = 1000 + chat * args.users_per_chat + rng.randrange(args.users_per_chat)
+        t0 = time.perf_counter()
+        bot.add_task(1000 + chat, user_id, f"Benchmark insert {i}", due + timedelta(seconds=i))
+        timings.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    return {"ops_per_s": round(args.inserts / total, 1), **percentiles(timings)}
+
+
+def sample_active_tasks(count, rng):
+    conn = bot.get_db()
+    max_id = conn.execute("SELECT MAX(id) FROM tasks").fetchone()[0] or 0
+    picked, attempts = [], 0
+    while len(picked) < count and attempts < count * 50:
+        attempts += 1
+        row = conn.execute(
+            "SELECT chat_id, user_id, user_task_id FROM tasks WHERE id=? AND is_done=0",
+            (rng.randint(1, max_id),)
+        ).fetchone()
+        if row:
+            picked.append(row)
+    return picked
+
+
+async def bench_handlers(args):
+    rng = random.Random(args.seed + 2)
+    targets = sample_active_tasks(args.samples, rng)
+    results = {}
+    for name, handler, command in (
+        ("list", bot.listall, "/list"),
+        ("info", bot.info_cmd, "/info {utid}"),
+        ("done", bot.done_cmd, "/done {utid}"),  # last: it finishes the sampled tasks
+    ):
+        timings = []
+        for chat_id, user_id, utid in targets:
+            text = command.format(utid=utid)
+            update = command_update(text, chat_id, user_id)
+            started = time.perf_counter()
+            await handler(update, command_context(text))
+            timings.append(time.perf_counter() - started)
+        results[name] = percentiles(timings)
+    return results
+
+
+def bench_logging(args):
+    writer = bot.debug_log_writer
+    started = time.perf_counter()
+    for i in range(args.log_events):
+        bot.log_debug_event(
+            event_type="command", title="/list", msg="/list", userid=1000 + i % 97, chatid=-1000 - i % 13
+        )
+    calls = time.perf_counter() - started
+    writer.close()  # joins the writer thread once everything queued is on disk
+    drained = time.perf_counter() - started
+    return {
+        "events": args.log_events,
+        "per_call_us": round(calls / args.log_events * 1e6, 2),
+        "drain_per_s": round(args.log_events / drained, 1),
+    }
+
+
+# — Driver —
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, timeout=10
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def add_dataset_arguments(parser):
+    """Options describing the synthetic database (shared with simulate.py)."""
+    parser.add_argument("--tasks", type=int, default=10000, help="tasks to generate (e.g. 10000, 100000, 1000000)")
+    parser.add_argument("--chats", type=int, default=100, help="number of chats the tasks are spread over")
+    parser.add_argument("--users-per-chat", type=int, default=3)
+    parser.add_argument("--due", choices=sorted(DUE_DISTRIBUTIONS), default="uniform",
+                        help="; ".join(f"{k}: {v}" for k, v in DUE_DISTRIBUTIONS.items()))
+    parser.add_argument("--burst-frac", type=float, default=0.05, help="share of tasks in the burst (--due burst)")
+    parser.add_argument("--done-frac", type=float, default=0.3, help="share of tasks already done")
+    parser.add_argument("--question-frac", type=float, default=0.2, help="share of tasks with follow-up questions")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="database file (default: a temporary file)")
+    parser.add_argument("--reuse", action="store_true", help="use an existing --db instead of generating one")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the scratch directory (debug log, and the database unless --db) after the run")
+
+
+def report_meta(args):
+    return {
+        "commit": git_commit(),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "args": {k: v for k, v in vars(args).items() if k != "out"},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_dataset_arguments(parser)
+    parser.add_argument("--only", default=",".join(SUITES), help=f"comma-separated suites ({', '.join(SUITES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="check_reminders runs")
+    parser.add_argument("--inserts", type=int, default=2000, help="add_task calls")
+    parser.add_argument("--samples", type=int, default=200, help="calls per handler")
+    parser.add_argument("--log-events", type=int, default=50000, help="log_debug_event calls")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    args.only = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = set(args.only) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+    if args.reuse and not (args.db and os.path.exists(args.db)):
+        parser.error("--reuse needs an existing --db")
+    return args
+
+
+async def run_suites(args, report):
+    if "tick" in args.only:
+        report["tick"] = await bench_tick(args)
+    if "insert" in args.only:
+        report["insert"] = bench_insert(args)
+    if "handlers" in args.only:
+        report["handlers"] = await bench_handlers(args)
+    if "logging" in args.only:
+        report["logging"] = bench_logging(args)
+
+
+@contextlib.contextmanager
+def open_dataset(args, prefix):
+    """Import bot against scratch files and generate (or reopen) the database.
+
+    Yields the build time in seconds, or None for a reused database. On the
+    way out the scratch directory is removed unless --keep was given; a --db
+    database lives outside it and always stays.
+    """
+    scratch = tempfile.mkdtemp(prefix=prefix)
+    try:
+        yield _open_dataset(args, scratch)
+    finally:
+        if bot is not None:
+            bot.DB_EXECUTOR.shutdown(wait=True)
+            bot.debug_log_writer.close()
+            bot.close_db()
+        if args.keep:
+            print(f"scratch files kept in {scratch}", file=sys.stderr)
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _open_dataset(args, scratch):
+    global bot
+    db_path = os.path.abspath(args.db) if args.db else os.path.join(scratch, "tasks.db")
+    if args.db and not args.reuse:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    os.environ["DB_PATH"] = db_path
+    os.environ["DEBUG_LOG_JSONL"] = os.path.join(scratch, "debug_log.jsonl")
+    os.environ.setdefault("TELEGRAM_TOKEN", "0:benchmark")  # never used to connect
+    # bot.py prints on import and appends to ./debug_log.txt: keep stdout for
+    # the JSON and leave that file in the scratch directory, not the caller's
+    cwd = os.getcwd()
+    os.chdir(scratch)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            import bot as bot_module
+    finally:
+        os.chdir(cwd)
+    bot = bot_module
+    if args.reuse:
+        bot.init_db()
+        return None
+    return build_database(args)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with open_dataset(args, "taskbot-bench-") as build_s:
+        report = {"meta": report_meta(args), "dataset": describe_dataset(build_s)}
+        asyncio.run(run_suites(args, report))
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
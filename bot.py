@@ -7,10 +7,26 @@ from datetime import datetime, timedelta
 import dateparser
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, CallbackQueryHandler, CallbackContext, MessageHandler
+    ApplicationBuilder, BaseUpdateProcessor, CommandHandler, CallbackQueryHandler, CallbackContext, MessageHandler
 )
-from apscheduler.schedulers.background import BackgroundScheduler
+import atexit
+import bisect
+import contextvars
+import csv
+import functools
+import hmac
+import io
+import queue
+import signal
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
 from telegram.constants import ParseMode
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+from telegram.request import HTTPXRequest
 import re
 from dotenv import load_dotenv
 from telegram.ext import ConversationHandler, filters
@@ -23,26 +39,128 @@ import config  # loads TELEGRAM_TOKEN
 
 # — Database file (absolute path) —
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "tasks.db")
+DB_PATH = os.getenv("DB_PATH", os.path.join(BASE_DIR, "tasks.db"))
 
 print("DEBUG: THIS IS THE TOP OF bot.py")
 with open("debug_log.txt", "a") as f:
     f.write("bot.py started\n")
 
-# --- Debug JSON Logger ---
-DEBUG_LOG_JSON = os.path.join(BASE_DIR, "debug_log.json")
+# --- Debug JSON Lines Logger ---
+# One JSON object per line, appended by a background thread in batches, so
+# logging an event costs a queue put instead of a read/rewrite of the whole
+# file. The file rotates by size and age; `number` keeps counting across
+# rotations and restarts.
+DEBUG_LOG_JSONL = os.getenv("DEBUG_LOG_JSONL", os.path.join(BASE_DIR, "debug_log.jsonl"))
+DEBUG_LOG_MAX_BYTES = int(os.getenv("DEBUG_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+DEBUG_LOG_MAX_AGE = int(os.getenv("DEBUG_LOG_MAX_AGE", str(24 * 3600)))  # seconds
+DEBUG_LOG_BACKUPS = int(os.getenv("DEBUG_LOG_BACKUPS", "5"))
+
+class DebugLogWriter:
+    def __init__(self, path, max_bytes, max_age, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._number = None
+        self._thread = None
+
+    def _last_number(self):
+        # Resume the sequence from the newest entry on disk
+        for path in (self.path, f"{self.path}.1"):
+            try:
+                number = self._tail_number(path)
+            except OSError:
+                continue
+            if number is not None:
+                return number
+        return 0
+
+    @staticmethod
+    def _tail_number(path, block=64 * 1024):
+        # Read backwards a block at a time until a complete line parses, so
+        # an entry of any length (or a torn last line) can't reset the count
+        with open(path, "rb") as f:
+            pos = f.seek(0, os.SEEK_END)
+            partial = b""
+            while pos > 0:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + partial).split(b"\n")
+                # lines[0] may continue in the previous block unless we hit the start
+                partial = lines.pop(0) if pos > 0 else b""
+                for line in reversed(lines):
+                    try:
+                        return json.loads(line)["number"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        return None
+
+    def log(self, entry):
+        with self._lock:
+            if self._number is None:
+                self._number = self._last_number()
+                self._thread = threading.Thread(target=self._run, name="debug-log", daemon=True)
+                self._thread.start()
+            self._number += 1
+            entry["number"] = self._number
+            self._queue.put(entry)
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+            self._number = None
+
+    def _open(self):
+        f = open(self.path, "a", encoding="utf-8")
+        try:
+            opened = os.path.getmtime(self.path) if f.tell() else time.time()
+        except OSError:
+            opened = time.time()
+        return f, opened
+
+    def _rotate(self, f):
+        f.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        return self._open()
+
+    def _run(self):
+        f, opened = self._open()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            lines = [json.dumps(e, ensure_ascii=False, default=str) for e in batch if e is not None]
+            if lines:
+                if f.tell() >= self.max_bytes or time.time() - opened >= self.max_age:
+                    f, opened = self._rotate(f)
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+            if stop:
+                f.close()
+                return
+
+debug_log_writer = DebugLogWriter(DEBUG_LOG_JSONL, DEBUG_LOG_MAX_BYTES, DEBUG_LOG_MAX_AGE, DEBUG_LOG_BACKUPS)
+atexit.register(debug_log_writer.close)
 
 def log_debug_event(event_type, title, msg, userid=None, chatid=None, extra=None):
-    # Load current log number
-    try:
-        with open(DEBUG_LOG_JSON, "r") as f:
-            logs = json.load(f)
-    except Exception:
-        logs = []
-    number = logs[-1]["number"] + 1 if logs else 1
     now = dt.now()
     entry = {
-        "number": number,
         "type": event_type,
         "title": title,
         "msg": msg,
@@ -53,9 +171,7 @@ def log_debug_event(event_type, title, msg, userid=None, chatid=None, extra=None
     }
     if extra:
         entry.update(extra)
-    logs.append(entry)
-    with open(DEBUG_LOG_JSON, "w") as f:
-        json.dump(logs, f, indent=2)
+    debug_log_writer.log(entry)
 
 # Log bot start
 log_debug_event(
@@ -107,16 +223,46 @@ def parse_interval_label(label):
             return num * mult
     return None
 
+# — Date Parsing —
+# dateparser costs milliseconds per call. Most input is our own ISO strings
+# or a plain date/time, so those are handled directly and only free-form
+# text ("next friday 5pm") reaches dateparser.
+_TIME_RE = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+_AMPM_RE = re.compile(r"^(\d{1,2})(?::(\d{2}))?\s*([ap])\.?m\.?$", re.IGNORECASE)
+DATETIME_FORMATS = ("%Y/%m/%d %H:%M", "%Y/%m/%d")
+
+def parse_datetime(text):
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    m = _TIME_RE.match(text)
+    if m:
+        hour, minute, second = int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+        if hour < 24 and minute < 60 and second < 60:
+            return clock.now().replace(hour=hour, minute=minute, second=second, microsecond=0)
+    m = _AMPM_RE.match(text)
+    if m:
+        hour, minute = int(m.group(1)), int(m.group(2) or 0)
+        if 1 <= hour <= 12 and minute < 60:
+            hour = hour % 12 + (12 if m.group(3).lower() == "p" else 0)
+            return clock.now().replace(hour=hour, minute=minute, second=0, microsecond=0)
+    for fmt in DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    # Relative phrases are resolved against the current minute, so repeats
+    # within that minute ("tomorrow 9am", "in 2 hours") hit the cache.
+    return _parse_natural(text, clock.now().replace(second=0, microsecond=0))
 
-# Add a helper to check if a user is blocked
-def is_user_blocked(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT 1 FROM blocked_users WHERE user_id=?", (user_id,))
-    blocked = cur.fetchone() is not None
-    conn.close()
-    return blocked
+@functools.lru_cache(maxsize=1024)
+def _parse_natural(text, base):
+    return dateparser.parse(text, settings={"RELATIVE_BASE": base})
 
-from functools import wraps
 
 def block_check(func):
     @wraps(func)
@@ -142,7 +288,7 @@ async def interval_reply_handler(update: Update, ctx: CallbackContext):
         await update.message.reply_text("No task found to set interval for. Please add or edit a task first.")
         return
     enabled = 1 if mins > 0 else 0
-    set_question_prefs(task_id, mins, enabled)
+    await run_db(set_question_prefs, task_id, mins, enabled)
     del interval_task_map[user_id]
     if enabled:
         await update.message.reply_text(f"✅ Reminding interval set: every {text}.")
@@ -151,29 +297,335 @@ async def interval_reply_handler(update: Update, ctx: CallbackContext):
 
 
 # — Database Helpers —
+# Every thread (event loop, scheduler executor) keeps one open connection
+# instead of connecting per call. WAL lets readers run alongside the
+# scheduler's writes; busy_timeout makes a writer wait rather than fail
+# with "database is locked".
+DB_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+_db_local = threading.local()
+
+def get_db():
+    conn = getattr(_db_local, "conn", None)
+    if conn is None or _db_local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH)
+        for pragma in DB_PRAGMAS:
+            conn.execute(pragma)
+        _db_local.conn = conn
+        _db_local.path = DB_PATH
+    return conn
+
+def close_db():
+    conn = getattr(_db_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _db_local.conn = None
+
+# — Handler Instrumentation —
+# Every registered handler is wrapped (instrument_handlers, called from
+# main) to record, per invocation: wall time, time spent awaiting run_db,
+# SQL statements those run_db calls executed and messages sent. The numbers
+# go into fixed-bucket histograms kept in memory; /astats perf shows them.
+PERF_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Bot API methods that put a message in front of a user
+SENT_METHOD_PREFIXES = ("send", "edit")
+
+class Histogram:
+    """Counts observations (milliseconds) into PERF_BUCKETS_MS."""
+
+    def __init__(self, buckets=PERF_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: above the top bucket
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.max
+
+class HandlerStats:
+    def __init__(self):
+        self.wall = Histogram()
+        self.db = Histogram()
+        self.queries = 0
+        self.sent = 0
+        self.errors = 0
+
+class Invocation:
+    """What one handler call (or one run_db call) has used so far."""
+    __slots__ = ("db_s", "queries", "sent")
+
+    def __init__(self):
+        self.db_s = 0.0
+        self.queries = 0
+        self.sent = 0
+
+    def count_query(self, _sql):
+        self.queries += 1
+
+handler_stats = {}  # handler name -> HandlerStats
+db_stats = {}  # DB helper name -> HandlerStats (wall = time awaited by the caller)
+perf_since = datetime.now()
+_current_invocation = contextvars.ContextVar("current_invocation", default=None)
+
+def instrumented(func):
+    """Record wall/DB time, query and sent-message counts for each call of a handler."""
+    @wraps(func)
+    async def wrapper(update, ctx, *args, **kwargs):
+        call = Invocation()
+        token = _current_invocation.set(call)
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await func(update, ctx, *args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _current_invocation.reset(token)
+            stats = handler_stats.get(func.__name__)
+            if stats is None:
+                stats = handler_stats[func.__name__] = HandlerStats()
+            stats.wall.observe((time.perf_counter() - started) * 1000)
+            stats.db.observe(call.db_s * 1000)
+            stats.queries += call.queries
+            stats.sent += call.sent
+            stats.errors += failed
+    wrapper.instrumented = True
+    return wrapper
+
+def instrument_handlers(handlers):
+    """Wrap the callbacks of `handlers` (recursing into conversations) with @instrumented."""
+    for handler in handlers:
+        if isinstance(handler, ConversationHandler):
+            instrument_handlers(handler.entry_points)
+            for state_handlers in handler.states.values():
+                instrument_handlers(state_handlers)
+            instrument_handlers(handler.fallbacks)
+        elif not getattr(handler.callback, "instrumented", False):
+            handler.callback = instrumented(handler.callback)
+
+def note_sent():
+    call = _current_invocation.get()
+    if call is not None:
+        call.sent += 1
+
+class CountingRequest(HTTPXRequest):
+    """The bot's HTTP client; counts messages sent on behalf of the current handler."""
+
+    async def do_request(self, url, method, *args, **kwargs):
+        if url.rsplit("/", 1)[-1].startswith(SENT_METHOD_PREFIXES):
+            note_sent()
+        return await super().do_request(url, method, *args, **kwargs)
+
+def _run_traced(call, fn):
+    # On a DB worker thread: count the statements fn runs on this thread's connection
+    conn = get_db()
+    conn.set_trace_callback(call.count_query)
+    try:
+        return fn()
+    finally:
+        conn.set_trace_callback(None)
+
+def format_perf_report(limit=20):
+    def rows(stats_by_name, is_handler):
+        lines = []
+        ranked = sorted(stats_by_name.items(), key=lambda item: item[1].wall.total, reverse=True)
+        for name, st in ranked[:limit]:
+            n = st.wall.count
+            line = f"{name}: n={n} p50≤{st.wall.quantile(0.5)} p95≤{st.wall.quantile(0.95)} max={st.wall.max:.0f}"
+            if is_handler:
+                line += f" db={st.db.total / n:.1f}"
+            line += f" q={st.queries / n:.1f}"
+            if is_handler:
+                line += f" sent={st.sent / n:.1f}"
+            if st.errors:
+                line += f" err={st.errors}"
+            lines.append(line)
+        return lines or ["(no calls yet)"]
+
+    return "\n".join([
+        f"Perf since {perf_since:%Y-%m-%d %H:%M} (ms; avg db/q/sent per call)",
+        "",
+        "Handlers:",
+        *rows(handler_stats, True),
+        "",
+        "DB helpers:",
+        *rows(db_stats, False),
+    ])
+
+# — Async Data Access —
+# Handlers must not block the event loop, so their queries run on a small
+# dedicated executor (each worker thread has its own get_db() connection).
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+DB_EXECUTOR = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking DB helper on the DB executor and await its result.
+
+    The call is timed and its statements counted, both per helper and for
+    the handler awaiting it (see Handler Instrumentation).
+    """
+    loop = asyncio.get_running_loop()
+    call = Invocation()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(DB_EXECUTOR, _run_traced, call, functools.partial(fn, *args, **kwargs))
+    finally:
+        elapsed = time.perf_counter() - started
+        name = getattr(fn, "__name__", "db")
+        stats = db_stats.get(name)
+        if stats is None:
+            stats = db_stats[name] = HandlerStats()
+        stats.wall.observe(elapsed * 1000)
+        stats.queries += call.queries
+        handler_call = _current_invocation.get()
+        if handler_call is not None:
+            handler_call.db_s += elapsed
+            handler_call.queries += call.queries
+
+def _db_fetchone(sql, params):
+    return get_db().execute(sql, params).fetchone()
+
+def _db_fetchall(sql, params):
+    return get_db().execute(sql, params).fetchall()
+
+def _db_execute(sql, params):
+    with get_db() as conn:
+        return conn.execute(sql, params).rowcount
+
+async def db_fetchone(sql, params=()):
+    return await run_db(_db_fetchone, sql, params)
+
+async def db_fetchall(sql, params=()):
+    return await run_db(_db_fetchall, sql, params)
+
+async def db_execute(sql, params=()):
+    """Execute one write statement in its own transaction; returns rowcount."""
+    return await run_db(_db_execute, sql, params)
+
+# — Schema migrations —
+# Every schema change is a numbered entry in MIGRATIONS and is applied
+# exactly once, recorded in schema_version. Blocking migrations run at
+# startup, each in its own transaction; online ones (large backfills) run
+# in the background after startup and commit in chunks. Once the schema is
+# current, init_db costs one read of schema_version. To change the schema
+# (or TASK_INDEXES), append a migration; never edit an applied one.
+
+# Oldest SQLite the SQL here runs on: INSERT … RETURNING (task numbers) needs
+# 3.35, UPDATE … FROM (renumbering) 3.33, upserts and window functions 3.24/3.25.
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+def check_sqlite_version():
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"SQLite {sqlite3.sqlite_version} is too old; TaskBot needs "
+            f"{'.'.join(map(str, MIN_SQLITE_VERSION))} or newer"
+        )
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    # Create table if missing
-    cur = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='tasks'"
-    )
-    if not cur.fetchone():
+    check_sqlite_version()
+    conn = get_db()
+    try:
+        applied = {v for (v,) in conn.execute("SELECT version FROM schema_version")}
+    except sqlite3.OperationalError:
         conn.execute(
-            "CREATE TABLE tasks ("
-            "id INTEGER PRIMARY KEY AUTOINCREMENT,"
-            "chat_id INTEGER NOT NULL,"
-            "user_id INTEGER,"
-            "user_task_id INTEGER,"
-            "description TEXT NOT NULL,"
-            "remind_at DATETIME,"
-            "is_done BOOLEAN NOT NULL DEFAULT 0,"
-            "question_interval INTEGER NOT NULL DEFAULT 0,"
-            "question_enabled BOOLEAN NOT NULL DEFAULT 0,"
-            "next_question_at DATETIME,"
-            "next_reminder_at DATETIME"
+            "CREATE TABLE schema_version ("
+            "version INTEGER PRIMARY KEY,"
+            "name TEXT NOT NULL,"
+            "applied_at DATETIME NOT NULL"
             ")"
         )
-    # Always ensure admin_sessions and blocked_users tables exist
+        conn.commit()
+        applied = set()
+    ran = False
+    for version, name, migrate, online in MIGRATIONS:
+        if version in applied or online:
+            continue
+        started = time.perf_counter()
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migrate(conn)
+            record_migration(conn, version, name)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        logger.info(f"🗂️ Migration {version} ({name}) applied in {time.perf_counter() - started:.2f} s")
+        ran = True
+    if ran:
+        # Indexes may need columns added by any migration, so they are
+        # brought in line with TASK_INDEXES once the whole batch is in
+        with conn:
+            sync_task_indexes(conn)
+        conn.execute("PRAGMA optimize")
+
+def record_migration(conn, version, name):
+    conn.execute(
+        "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+        (version, name, datetime.now().isoformat())
+    )
+
+def run_online_migrations():
+    """Apply pending online migrations; called in the background at startup."""
+    conn = get_db()
+    applied = {v for (v,) in conn.execute("SELECT version FROM schema_version")}
+    for version, name, migrate, online in MIGRATIONS:
+        if online and version not in applied:
+            migrate(conn)  # commits its own chunks
+            with conn:
+                record_migration(conn, version, name)
+
+def log_online_migration_errors(future):
+    # run_online_migrations runs unawaited in the background; without this
+    # a failure (e.g. in the epoch backfill) would vanish silently
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Online migrations failed; they will be retried at the next start",
+                     exc_info=future.exception())
+
+def migrate_base_schema(conn):
+    # Current layout for new databases; databases from before schema_version
+    # get whatever columns they are missing
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS tasks ("
+        "id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        "chat_id INTEGER NOT NULL,"
+        "user_id INTEGER,"
+        "user_task_id INTEGER,"
+        "description TEXT NOT NULL,"
+        "remind_at DATETIME,"
+        "is_done BOOLEAN NOT NULL DEFAULT 0,"
+        "question_interval INTEGER NOT NULL DEFAULT 0,"
+        "question_enabled BOOLEAN NOT NULL DEFAULT 0,"
+        "next_question_at DATETIME,"
+        "next_reminder_at DATETIME,"
+        "topic TEXT,"
+        "subject TEXT,"
+        "remind_ts INTEGER,"
+        "next_reminder_ts INTEGER,"
+        "next_question_ts INTEGER"
+        ")"
+    )
     conn.execute(
         "CREATE TABLE IF NOT EXISTS admin_sessions ("
         "user_id INTEGER PRIMARY KEY,"
@@ -187,66 +639,260 @@ def init_db():
         "blocked_at DATETIME"
         ")"
     )
-    # Migrate schema: add new columns if absent
-    info = conn.execute("PRAGMA table_info(tasks)").fetchall()
-    cols = [row[1] for row in info]
-    if 'user_id' not in cols:
-        conn.execute("ALTER TABLE tasks ADD COLUMN user_id INTEGER")
-    if 'user_task_id' not in cols:
-        conn.execute("ALTER TABLE tasks ADD COLUMN user_task_id INTEGER")
-    if 'next_question_at' not in cols:
-        conn.execute("ALTER TABLE tasks ADD COLUMN next_question_at DATETIME")
-    if 'next_reminder_at' not in cols:
-        conn.execute("ALTER TABLE tasks ADD COLUMN next_reminder_at DATETIME")
-    if 'topic' not in cols:
-        conn.execute("ALTER TABLE tasks ADD COLUMN topic TEXT")
-    if 'subject' not in cols:
-        conn.execute("ALTER TABLE tasks ADD COLUMN subject TEXT")
-    # Assign user_task_id for existing tasks if missing
-    cur = conn.execute("SELECT chat_id, user_id FROM tasks WHERE user_task_id IS NULL GROUP BY chat_id, user_id")
-    for chat_id, user_id in cur.fetchall():
-        tcur = conn.execute(
-            "SELECT id FROM tasks WHERE chat_id=? AND user_id=? ORDER BY id",
-            (chat_id, user_id)
-        )
-        for idx, (tid,) in enumerate(tcur.fetchall(), 1):
-            conn.execute("UPDATE tasks SET user_task_id=? WHERE id=?", (idx, tid))
-    conn.commit()
-    conn.close()
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    for col, decl in (
+        ("user_id", "INTEGER"),
+        ("user_task_id", "INTEGER"),
+        ("next_question_at", "DATETIME"),
+        ("next_reminder_at", "DATETIME"),
+        ("topic", "TEXT"),
+        ("subject", "TEXT"),
+        # UTC epoch-second copies of the three time columns, written
+        # alongside them; existing rows are filled in by backfill_epoch_columns()
+        ("remind_ts", "INTEGER"),
+        ("next_reminder_ts", "INTEGER"),
+        ("next_question_ts", "INTEGER"),
+    ):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN {col} {decl}")
+    # Legacy rows without next_reminder_at used to be treated as due on every
+    # tick; give them a concrete time so the due-window query can see them.
+    now = datetime.now().isoformat()
+    conn.execute(
+        "UPDATE tasks SET next_reminder_at=COALESCE(remind_at, ?), "
+        f"next_reminder_ts={sql_epoch('COALESCE(remind_at, ?)')} "
+        "WHERE is_done=0 AND next_reminder_at IS NULL",
+        (now, now)
+    )
 
+def migrate_user_task_ids(conn):
+    # Per-user task number counters; last_id is the most recently issued user_task_id
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS task_sequences ("
+        "chat_id INTEGER NOT NULL,"
+        "user_id INTEGER NOT NULL,"
+        "last_id INTEGER NOT NULL,"
+        "PRIMARY KEY (chat_id, user_id)"
+        ")"
+    )
+    # Duplicate user_task_ids could be handed out by the old MAX()+1
+    # allocation; keep the oldest row of each clash and renumber the rest.
+    conn.execute(
+        "UPDATE tasks SET user_task_id=NULL WHERE id IN ("
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY chat_id, user_id, user_task_id ORDER BY id) AS dup "
+        "FROM tasks WHERE user_task_id IS NOT NULL) WHERE dup>1)"
+    )
+    number_missing_user_task_ids(conn)
+
+# — Task indexes —
+# The complete set of secondary indexes on tasks, one per hot access path.
+# sync_task_indexes() creates missing ones, rebuilds any whose definition
+# changed and drops idx_tasks_* indexes no longer listed here. It runs after
+# each batch of migrations, so an edit here ships with a new migration.
+TASK_INDEXES = {
+    # Scheduler due-window: partial indexes over active tasks only
+    "idx_tasks_due_reminder": "INDEX idx_tasks_due_reminder ON tasks(next_reminder_ts) WHERE is_done=0",
+    "idx_tasks_due_question": (
+        "INDEX idx_tasks_due_question ON tasks(next_question_ts) WHERE is_done=0 AND question_enabled=1"
+    ),
+    # /done, /edit, /del, /info: resolve a user's task number; also covers
+    # the DISTINCT chat/user listings (/achats, /aulist)
+    "idx_tasks_user_task_id": "UNIQUE INDEX idx_tasks_user_task_id ON tasks(chat_id, user_id, user_task_id)",
+    # /list and /alist pages: rows come out in list order (rowid breaks
+    # ties), so a keyset page reads only the rows it shows
+    "idx_tasks_list": "INDEX idx_tasks_list ON tasks(chat_id, user_id, is_done, remind_at)",
+    # /audel USER_ID all, /ausers
+    "idx_tasks_user": "INDEX idx_tasks_user ON tasks(user_id)",
+    # Archiver: done tasks by completion time
+    "idx_tasks_done": "INDEX idx_tasks_done ON tasks(done_ts) WHERE is_done=1",
+}
+
+def sync_task_indexes(conn):
+    existing = dict(conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name='tasks' AND name LIKE 'idx_tasks_%'"
+    ).fetchall())
+    for name, sql in existing.items():
+        if TASK_INDEXES.get(name) is None or sql != f"CREATE {TASK_INDEXES[name]}":
+            conn.execute(f"DROP INDEX {name}")
+            existing[name] = None
+    for name, definition in TASK_INDEXES.items():
+        if not existing.get(name):
+            conn.execute(f"CREATE {definition}")
+
+# — Epoch timestamp columns —
+# remind_at/next_reminder_at/next_question_at stay ISO text for display;
+# the *_ts twins hold the same instant as integer UTC epoch seconds, so the
+# scheduler filters and orders in SQLite with integer index comparisons and
+# never parses a string.
+EPOCH_BACKFILL_CHUNK = 5000
+
+def sql_epoch(expr):
+    # ISO local time -> UTC epoch seconds, NULL for NULL/unparseable input
+    return f"CAST(strftime('%s', {expr}, 'utc') AS INTEGER)"
+
+def backfill_epoch_columns(conn):
+    """Fill the *_ts columns for rows written before they existed.
+
+    Online migration: one committed chunk of ids at a time, so the bot keeps
+    serving meanwhile. Each UPDATE derives the epoch from the row's current
+    ISO value, so it cannot race the dual writes.
+    """
+    last_id, converted = 0, 0
+    started = time.perf_counter()
+    while True:
+        row = conn.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM tasks WHERE id>? ORDER BY id LIMIT ?)",
+            (last_id, EPOCH_BACKFILL_CHUNK)
+        ).fetchone()
+        if row[0] is None:
+            break
+        with conn:
+            converted += conn.execute(
+                f"UPDATE tasks SET remind_ts={sql_epoch('remind_at')}, "
+                f"next_reminder_ts={sql_epoch('next_reminder_at')}, "
+                f"next_question_ts={sql_epoch('next_question_at')} "
+                "WHERE id>? AND id<=?",
+                (last_id, row[0])
+            ).rowcount
+        last_id = row[0]
+    logger.info(f"🗂️ Epoch backfill: {converted} tasks converted in {time.perf_counter() - started:.1f} s")
+
+def sync_task_sequences(conn):
+    """Raise each counter to at least the highest user_task_id in use."""
+    conn.execute(
+        "INSERT INTO task_sequences (chat_id, user_id, last_id) "
+        "SELECT chat_id, user_id, MAX(user_task_id) FROM tasks "
+        "WHERE user_id IS NOT NULL AND user_task_id IS NOT NULL GROUP BY chat_id, user_id "
+        "ON CONFLICT (chat_id, user_id) DO UPDATE SET last_id=MAX(last_id, excluded.last_id)"
+    )
 
-def add_task(chat_id, user_id, desc, remind_dt, topic=None, subject=None):
-    conn = sqlite3.connect(DB_PATH)
-    # Get next user_task_id for this user in this chat
-    cur = conn.execute(
-        "SELECT COALESCE(MAX(user_task_id), 0) + 1 FROM tasks WHERE chat_id=? AND user_id=?",
-        (chat_id, user_id)
+def next_user_task_id(conn, chat_id, user_id):
+    """Issue the next user_task_id; runs inside the caller's transaction."""
+    return reserve_user_task_ids(conn, chat_id, user_id, 1)
+
+def reserve_user_task_ids(conn, chat_id, user_id, count):
+    """Reserve `count` consecutive user_task_ids and return the first one."""
+    last = conn.execute(
+        "INSERT INTO task_sequences (chat_id, user_id, last_id) VALUES (?, ?, ?) "
+        "ON CONFLICT (chat_id, user_id) DO UPDATE SET last_id=last_id+excluded.last_id RETURNING last_id",
+        (chat_id, user_id, count)
+    ).fetchone()[0]
+    return last - count + 1
+
+def number_missing_user_task_ids(conn):
+    """Number rows lacking a user_task_id after each user's existing ones."""
+    conn.execute(
+        "WITH bases AS ("
+        "  SELECT chat_id, user_id, MAX(user_task_id) AS base FROM tasks"
+        "  WHERE user_id IS NOT NULL GROUP BY chat_id, user_id"
+        "), numbered AS ("
+        "  SELECT t.id, ROW_NUMBER() OVER (PARTITION BY t.chat_id, t.user_id ORDER BY t.id)"
+        "    + MAX(COALESCE(b.base, 0), COALESCE(s.last_id, 0)) AS n"
+        "  FROM tasks t"
+        "  LEFT JOIN bases b ON b.chat_id=t.chat_id AND b.user_id=t.user_id"
+        "  LEFT JOIN task_sequences s ON s.chat_id=t.chat_id AND s.user_id=t.user_id"
+        "  WHERE t.user_task_id IS NULL AND t.user_id IS NOT NULL"
+        ") "
+        "UPDATE tasks SET user_task_id=numbered.n FROM numbered WHERE tasks.id=numbered.id"
     )
-    user_task_id = cur.fetchone()[0]
-    cur = conn.execute(
-        "INSERT INTO tasks (chat_id, user_id, user_task_id, description, remind_at, topic, subject) VALUES (?,?,?,?,?,?,?)",
-        (chat_id, user_id, user_task_id, desc, remind_dt.isoformat(), topic, subject)
+    sync_task_sequences(conn)
+
+
+def migrate_task_archive(conn):
+    conn.execute("ALTER TABLE tasks ADD COLUMN done_ts INTEGER")
+    # Tasks finished before done_ts existed count as done now
+    conn.execute("UPDATE tasks SET done_ts=? WHERE is_done=1", (int(time.time()),))
+    conn.execute(
+        "CREATE TABLE tasks_archive ("
+        "id INTEGER PRIMARY KEY,"
+        "chat_id INTEGER NOT NULL,"
+        "user_id INTEGER,"
+        "user_task_id INTEGER,"
+        "description TEXT NOT NULL,"
+        "remind_at DATETIME,"
+        "is_done BOOLEAN NOT NULL DEFAULT 1,"
+        "question_interval INTEGER NOT NULL DEFAULT 0,"
+        "topic TEXT,"
+        "subject TEXT,"
+        "remind_ts INTEGER,"
+        "done_ts INTEGER,"
+        "archived_ts INTEGER NOT NULL"
+        ")"
     )
-    task_id = cur.lastrowid
-    # initialize next_reminder_at to the due time
+    conn.execute("CREATE INDEX idx_archive_user_task_id ON tasks_archive(chat_id, user_id, user_task_id)")
+    conn.execute("CREATE INDEX idx_archive_list ON tasks_archive(chat_id, user_id, remind_at)")
+
+def migrate_chat_settings(conn):
     conn.execute(
-        "UPDATE tasks SET next_reminder_at=? WHERE id=?",
-        (remind_dt.isoformat(), task_id)
+        "CREATE TABLE chat_settings ("
+        "chat_id INTEGER PRIMARY KEY,"
+        "digest INTEGER NOT NULL DEFAULT 0"
+        ")"
     )
-    conn.commit()
-    conn.close()
+
+def assign_legacy_owners(conn):
+    # Rows from before per-user tasks have no user_id; they belonged to
+    # private chats, so the chat is the owner. Renumber them after the
+    # user's existing tasks.
+    conn.execute("UPDATE tasks SET user_id = chat_id, user_task_id = NULL WHERE user_id IS NULL")
+    number_missing_user_task_ids(conn)
+
+def migrate_list_keys(conn):
+    # Keyset paging compares (…, user_id, …, remind_at, id) row values, and a
+    # NULL in any of them makes the comparison NULL, ending the listing
+    # after page 1. Legacy rows get an owner here; migration 8 fills in
+    # their remind_at.
+    assign_legacy_owners(conn)
+    conn.execute("UPDATE tasks_archive SET user_id = chat_id WHERE user_id IS NULL")
+
+def migrate_due_sentinel(conn):
+    # Legacy rows may have no due time. Store '' (sorts before any date)
+    # rather than NULL so the list indexes stay on the plain remind_at
+    # column: SQLite can only seek on a row-value keyset predicate through
+    # plain columns, not through COALESCE(). Writers always set remind_at.
+    conn.execute("UPDATE tasks SET remind_at = '' WHERE remind_at IS NULL")
+    conn.execute("UPDATE tasks_archive SET remind_at = '' WHERE remind_at IS NULL")
+    # Undo the COALESCE() index an earlier build of migration 7 created
+    conn.execute("DROP INDEX IF EXISTS idx_archive_list")
+    conn.execute("CREATE INDEX idx_archive_list ON tasks_archive(chat_id, user_id, remind_at)")
+
+MIGRATIONS = [
+    # (version, name, function, online)
+    (1, "base schema", migrate_base_schema, False),
+    (2, "per-user task numbers", migrate_user_task_ids, False),
+    # 3 was "task indexes": TASK_INDEXES is now synced after every batch
+    (4, "epoch timestamp backfill", backfill_epoch_columns, True),
+    (5, "task archive", migrate_task_archive, False),
+    (6, "chat settings", migrate_chat_settings, False),
+    (7, "list keys without NULLs", migrate_list_keys, False),
+    (8, "empty due time instead of NULL", migrate_due_sentinel, False),
+]
+
+
+def add_task(chat_id, user_id, desc, remind_dt, topic=None, subject=None):
+    conn = get_db()
+    # The counter bump and the insert share one transaction, so concurrent
+    # adds can never hand out the same user_task_id.
+    with conn:
+        user_task_id = next_user_task_id(conn, chat_id, user_id)
+        cur = conn.execute(
+            "INSERT INTO tasks (chat_id, user_id, user_task_id, description, remind_at, next_reminder_at, "
+            "remind_ts, next_reminder_ts, topic, subject) VALUES (?,?,?,?,?,?,?,?,?,?)",
+            (chat_id, user_id, user_task_id, desc, remind_dt.isoformat(), remind_dt.isoformat(),
+             to_epoch(remind_dt), to_epoch(remind_dt), topic, subject)
+        )
+        task_id = cur.lastrowid
+    reminder_scheduler.notify(remind_dt)
     return task_id, user_task_id
 
 async def list_tasks(update: Update, ctx: CallbackContext):
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute(
+    rows = await db_fetchall(
         "SELECT user_task_id, description, remind_at, is_done, topic, subject FROM tasks WHERE chat_id=? AND user_id=? ORDER BY is_done, remind_at",
         (chat_id, user_id)
     )
-    rows = cur.fetchall()
-    conn.close()
     if not rows:
         return await update.message.reply_text("You have no tasks.")
     lines = []
@@ -263,30 +909,32 @@ async def list_tasks(update: Update, ctx: CallbackContext):
 
 
 def mark_done(task_id, user_id=None, admin=False):
-    conn = sqlite3.connect(DB_PATH)
+    # No scheduler update needed: finished tasks drop out of next_due_ts, and
+    # a wakeup already planned for this one just finds nothing due.
+    conn = get_db()
+    done_ts = int(clock.time())
     if admin:
-        conn.execute("UPDATE tasks SET is_done=1 WHERE id=?", (task_id,))
+        conn.execute("UPDATE tasks SET is_done=1, done_ts=? WHERE id=?", (done_ts, task_id))
     else:
-        conn.execute("UPDATE tasks SET is_done=1 WHERE id=? AND user_id=?", (task_id, user_id))
+        conn.execute("UPDATE tasks SET is_done=1, done_ts=? WHERE id=? AND user_id=?", (done_ts, task_id, user_id))
     conn.commit()
-    conn.close()
 
 
 def set_question_prefs(task_id, interval_min, enabled):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     if enabled and interval_min > 0:
-        next_q = datetime.now() + timedelta(minutes=interval_min)
+        next_q = clock.now() + timedelta(minutes=interval_min)
         conn.execute(
-            "UPDATE tasks SET question_interval=?,question_enabled=?,next_question_at=? WHERE id=?",
-            (interval_min, enabled, next_q.isoformat(), task_id)
+            "UPDATE tasks SET question_interval=?,question_enabled=?,next_question_at=?,next_question_ts=? WHERE id=?",
+            (interval_min, enabled, next_q.isoformat(), to_epoch(next_q), task_id)
         )
+        reminder_scheduler.notify(next_q)
     else:
         conn.execute(
-            "UPDATE tasks SET question_interval=?,question_enabled=?,next_question_at=NULL WHERE id=?",
+            "UPDATE tasks SET question_interval=?,question_enabled=?,next_question_at=NULL,next_question_ts=NULL WHERE id=?",
             (interval_min, enabled, task_id)
         )
     conn.commit()
-    conn.close()
 
 # Apply @block_check to all user and admin command handlers
 @block_check
@@ -369,7 +1017,7 @@ async def add(update: Update, ctx: CallbackContext):
             "❌ Usage: \n/add then hit Enter/return key, and follow up with the steps.\nOr\n/add <SUBJECT> <TOPIC> <DESCRIPTION> at YYYY-MM-DD HH:MM\nOr\n/skip to skip or /cancel to cancel task.",
             parse_mode=None
         )
-    dt = dateparser.parse(timestr)
+    dt = parse_datetime(timestr)
     if not dt:
         return await update.message.reply_text(
             "❌ Could not parse date/time. Please use a format like YYYY-MM-DD HH:MM.",
@@ -377,7 +1025,7 @@ async def add(update: Update, ctx: CallbackContext):
         )
 
     user_id = update.effective_user.id
-    task_id, user_task_id = add_task(update.effective_chat.id, user_id, desc, dt, topic, subject)
+    task_id, user_task_id = await run_db(add_task, update.effective_chat.id, user_id, desc, dt, topic, subject)
 
     # Dynamic intervals
     intervals = get_dynamic_intervals(dt)
@@ -395,6 +1043,108 @@ async def add(update: Update, ctx: CallbackContext):
     )
     interval_task_map[user_id] = task_id
 
+# — Paginated task lists (/list, /alist) —
+# Pages are fetched with keyset pagination: the Prev/Next buttons carry the
+# id of the first/last row shown, the query seeks past that row's sort key,
+# and only LIST_PAGE_SIZE + 1 rows are ever read.
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "15"))
+LIST_DESC_MAX = 200
+TASK_PAGE_COLUMNS = "id, chat_id, user_id, user_task_id, description, remind_at, is_done, topic, subject"
+
+# view -> (table, scope filter, sort key). Every sort key must be a plain,
+# non-NULL column: a NULL turns the keyset row-value comparison NULL and the
+# listing stops, and an expression keeps SQLite from seeking through the
+# list index. add_task and /import always set remind_at, and migrations 7
+# and 8 gave legacy rows a user_id and an empty ('') remind_at.
+LIST_VIEWS = {
+    "l": ("tasks", "chat_id=? AND user_id=?", ("is_done", "remind_at", "id")),           # /list
+    "lc": ("tasks", "chat_id=?", ("user_id", "is_done", "remind_at", "id")),             # /list as admin
+    "a": ("tasks", "chat_id=?", ("user_id", "is_done", "remind_at", "id")),              # /alist
+    "aa": ("tasks", None, ("chat_id", "user_id", "is_done", "remind_at", "id")),         # /alist all
+    "la": ("tasks_archive", "chat_id=? AND user_id=?", ("remind_at", "id")),             # /list archived
+}
+LIST_EMPTY_TEXT = {
+    "l": "You have no tasks.",
+    "la": "You have no archived tasks.",
+    "lc": "No tasks found in this chat.",
+    "a": "No tasks found in this chat.",
+    "aa": "No tasks found in any chat.",
+}
+
+def task_page_sql(view, keyed=False, backward=False):
+    """SQL for one page of `view`; keyed pages seek past an anchor's sort key."""
+    table, where, order = LIST_VIEWS[view]
+    clauses = [where] if where else []
+    if keyed:
+        clauses.append(f"({', '.join(order)}) {'<' if backward else '>'} ({', '.join('?' * len(order))})")
+    sql = f"SELECT {TASK_PAGE_COLUMNS} FROM {table}"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql + " ORDER BY " + ", ".join(f"{col} DESC" if backward else col for col in order) + " LIMIT ?"
+
+def fetch_task_page(view, scope, anchor_id=None, backward=False, limit=LIST_PAGE_SIZE):
+    """Return (rows, has_more) for the page after (or before) `anchor_id`."""
+    table, _, order = LIST_VIEWS[view]
+    conn = get_db()
+    params = list(scope)
+    key = None
+    if anchor_id is not None:
+        # anchor gone (deleted meanwhile): fall back to the first page
+        key = conn.execute(f"SELECT {', '.join(order)} FROM {table} WHERE id=?", (anchor_id,)).fetchone()
+        if key:
+            params.extend(key)
+    params.append(limit + 1)
+    rows = conn.execute(task_page_sql(view, bool(key), backward), params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    return rows, has_more
+
+def format_task_line(view, row):
+    tid, chat_id, uid, utid, desc, remind_at, is_done, topic, subject = row
+    if len(desc) > LIST_DESC_MAX:
+        desc = desc[:LIST_DESC_MAX] + "…"
+    extra = ""
+    if topic:
+        extra += f"[Topic: {topic}] "
+    if subject:
+        extra += f"[Subject: {subject}] "
+    if view in ("l", "lc", "la"):
+        status = "✅" if is_done else "🕒"
+        due = f" (due {remind_at})" if remind_at else ""
+        owner = f" (user {uid})" if view == "lc" else ""
+        return f"[{utid}] {status} {extra}{desc}{due}{owner}"
+    status = "✅ done" if is_done else "⏳ active"
+    where = f"Chat {chat_id} | " if view == "aa" else ""
+    return f"{where}User {uid}: Task {tid} — {extra}{desc}\n    • due: {remind_at or '—'} | {status}"
+
+def render_task_page(view, owner, rows, has_prev, has_next):
+    sep = "\n" if view in ("l", "lc", "la") else "\n\n"
+    text = sep.join(format_task_line(view, row) for row in rows)
+    buttons = []
+    if has_prev:
+        buttons.append(InlineKeyboardButton("◀️ Prev", callback_data=f"pg|{view}|p|{owner}|{rows[0][0]}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("Next ▶️", callback_data=f"pg|{view}|n|{owner}|{rows[-1][0]}"))
+    return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+def list_view_scope(view, chat_id, owner):
+    if view in ("l", "la"):
+        return (chat_id, owner)
+    if view in ("lc", "a"):
+        return (chat_id,)
+    return ()
+
+async def send_task_page(update, view):
+    owner = update.effective_user.id
+    scope = list_view_scope(view, update.effective_chat.id, owner)
+    rows, has_more = await run_db(fetch_task_page, view, scope)
+    if not rows:
+        return await update.message.reply_text(LIST_EMPTY_TEXT[view])
+    text, markup = render_task_page(view, owner, rows, False, has_more)
+    await update.message.reply_text(text, reply_markup=markup)
+
 @block_check
 async def listall(update: Update, ctx: CallbackContext):
     log_debug_event(
@@ -404,51 +1154,36 @@ async def listall(update: Update, ctx: CallbackContext):
         userid=update.effective_user.id,
         chatid=update.effective_chat.id,
     )
+    if ctx.args and ctx.args[0] == "archived":
+        return await send_task_page(update, "la")
     user_id = update.effective_user.id
-    chat_id = update.effective_chat.id
     is_admin = is_admin_user(update) or user_id in admineba
-    conn = sqlite3.connect(DB_PATH)
-    if is_admin:
-        cur = conn.execute(
-            "SELECT id, user_task_id, description, remind_at, is_done, user_id, topic, subject FROM tasks WHERE chat_id=? ORDER BY user_id, is_done, remind_at",
-            (chat_id,)
-        )
-        rows = cur.fetchall()
-        if not rows:
-            conn.close()
-            return await update.message.reply_text("No tasks found in this chat.")
-        lines = []
-        for tid, utid, desc, remind_at, is_done, uid, topic, subject in rows:
-            status = "✅" if is_done else "🕒"
-            due = f" (due {remind_at})" if remind_at else ""
-            extra = ""
-            if topic:
-                extra += f"[Topic: {topic}] "
-            if subject:
-                extra += f"[Subject: {subject}] "
-            lines.append(f"[{utid}] {status} {extra}{desc}{due} (user {uid})")
-        conn.close()
-        await update.message.reply_text("\n".join(lines))
-    else:
-        cur = conn.execute(
-            "SELECT user_task_id, description, remind_at, is_done, topic, subject FROM tasks WHERE chat_id=? AND user_id=? ORDER BY is_done, remind_at",
-            (chat_id, user_id)
-        )
-        rows = cur.fetchall()
-        conn.close()
-        if not rows:
-            return await update.message.reply_text("You have no tasks.")
-        lines = []
-        for utid, desc, remind_at, is_done, topic, subject in rows:
-            status = "✅" if is_done else "🕒"
-            due = f" (due {remind_at})" if remind_at else ""
-            extra = ""
-            if topic:
-                extra += f"[Topic: {topic}] "
-            if subject:
-                extra += f"[Subject: {subject}] "
-            lines.append(f"[{utid}] {status} {extra}{desc}{due}")
-        await update.message.reply_text("\n".join(lines))
+    await send_task_page(update, "lc" if is_admin else "l")
+
+async def list_page_cb(update: Update, ctx: CallbackContext):
+    query = update.callback_query
+    parts = query.data.split("|")
+    if len(parts) != 5 or parts[1] not in LIST_VIEWS or parts[2] not in ("p", "n") \
+            or not parts[3].isdigit() or not parts[4].isdigit():
+        return await query.answer()
+    _, view, direction, owner, anchor_id = parts
+    owner, anchor_id = int(owner), int(anchor_id)
+    user_id = query.from_user.id
+    if user_id != owner or is_user_blocked(user_id):
+        return await query.answer("This list belongs to someone else.")
+    if view in ("a", "aa") and not is_admin_logged_in(user_id):
+        return await query.answer("❌ You must be an admin to use this command.")
+    if view == "lc" and not (is_admin_logged_in(user_id) or user_id in admineba):
+        view, direction, anchor_id = "l", "n", None  # admin session ended: restart on own tasks
+    await query.answer()
+    backward = direction == "p"
+    scope = list_view_scope(view, query.message.chat_id, owner)
+    rows, has_more = await run_db(fetch_task_page, view, scope, anchor_id, backward)
+    if not rows:
+        return await query.edit_message_text(LIST_EMPTY_TEXT[view])
+    has_prev, has_next = (has_more, True) if backward else (anchor_id is not None, has_more)
+    text, markup = render_task_page(view, owner, rows, has_prev, has_next)
+    await query.edit_message_text(text, reply_markup=markup)
 
 @block_check
 async def done_cmd(update: Update, ctx: CallbackContext):
@@ -468,15 +1203,11 @@ async def done_cmd(update: Update, ctx: CallbackContext):
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
     # Look up real id
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
-    row = cur.fetchone()
+    row = await db_fetchone("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
     if not row:
-        conn.close()
         return await update.message.reply_text("Task not found.")
     tid = row[0]
-    conn.close()
-    mark_done(tid, user_id, admin=False)
+    await run_db(mark_done, tid, user_id, admin=False)
     await update.message.reply_text(f"🗹 Task `{utid}` marked done.", parse_mode="Markdown")
 
 @block_check
@@ -490,7 +1221,7 @@ async def question_interval_cb(update: Update, ctx: CallbackContext):
     _, tid, mins = parts
     tid, mins = int(tid), int(mins)
     enabled = 1 if mins > 0 else 0
-    set_question_prefs(tid, mins, enabled)
+    await run_db(set_question_prefs, tid, mins, enabled)
     text = "disabled ❌" if enabled == 0 else f"every *{mins} minutes*"
     await query.edit_message_text(
         f"Question reminders for task `{tid}` {text}.",
@@ -516,7 +1247,7 @@ async def alogin(update: Update, ctx: CallbackContext):
         )
     username, password = args
     if username in admin_credentials and admin_credentials[username] == password:
-        admin_login(user_id, username)
+        await run_db(admin_login, user_id, username)
         await update.message.reply_text(
             f"✅ Admin login successful as *{username}*.",
             parse_mode=ParseMode.MARKDOWN
@@ -543,7 +1274,7 @@ async def alogout(update: Update, ctx: CallbackContext):
     )
     user_id = update.effective_user.id
     if is_admin_logged_in(user_id):
-        admin_logout(user_id)
+        await run_db(admin_logout, user_id)
         await update.message.reply_text("✅ Admin logged out.")
         await start(update, ctx)
     else:
@@ -572,10 +1303,7 @@ async def edit(update: Update, ctx: CallbackContext):
     # If no fields provided, launch the edit wizard
     if not rest.strip():
         # Look up the real task id for this user and chat
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.execute("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
-        row = cur.fetchone()
-        conn.close()
+        row = await db_fetchone("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
         if not row:
             return await update.message.reply_text("Task not found or you do not have permission to edit it.")
         tid = row[0]
@@ -605,11 +1333,8 @@ async def edit(update: Update, ctx: CallbackContext):
             "Nothing to edit. Provide desc=, due=, topic=, or subject=.",
             parse_mode=None
         )
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id, remind_at FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
-    row = cur.fetchone()
+    row = await db_fetchone("SELECT id, remind_at FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
     if not row:
-        conn.close()
         return await update.message.reply_text("Task not found or you do not have permission to edit it.")
     tid, remind_at = row
     updates = []
@@ -618,13 +1343,11 @@ async def edit(update: Update, ctx: CallbackContext):
         updates.append("description=?")
         params.append(desc)
     if due is not None:
-        from dateparser import parse as parse_date
-        dt = parse_date(due)
+        dt = parse_datetime(due)
         if not dt:
-            conn.close()
             return await update.message.reply_text("Invalid due date format.")
-        updates.append("remind_at=?")
-        params.append(dt.isoformat())
+        updates.append("remind_at=?, next_reminder_at=?, remind_ts=?, next_reminder_ts=?")
+        params.extend([dt.isoformat(), dt.isoformat(), to_epoch(dt), to_epoch(dt)])
     if topic is not None:
         updates.append("topic=?")
         params.append(topic)
@@ -632,18 +1355,16 @@ async def edit(update: Update, ctx: CallbackContext):
         updates.append("subject=?")
         params.append(subject)
     params.append(tid)
-    conn.execute(f"UPDATE tasks SET {', '.join(updates)} WHERE id=?", params)
-    conn.commit()
-    conn.close()
+    await db_execute(f"UPDATE tasks SET {', '.join(updates)} WHERE id=?", params)
+    if due is not None:
+        reminder_scheduler.notify(dt)
     await update.message.reply_text(f"Task {utid} updated.")
     # Always prompt for interval after quick edit
     # Use the latest due date (remind_at) from DB
-    with sqlite3.connect(DB_PATH) as conn2:
-        cur2 = conn2.execute("SELECT remind_at FROM tasks WHERE id=?", (tid,))
-        row2 = cur2.fetchone()
-        remind_at2 = row2[0] if row2 else None
+    row2 = await db_fetchone("SELECT remind_at FROM tasks WHERE id=?", (tid,))
+    remind_at2 = row2[0] if row2 else None
     if remind_at2:
-        dt2 = dateparser.parse(remind_at2)
+        dt2 = parse_datetime(remind_at2)
         if dt2:
             intervals = get_dynamic_intervals(dt2)
             keyboard = ReplyKeyboardMarkup([[str(i) + ' min' if i < 60 else (str(i//60) + ' hr' if i < 1440 else (str(i//1440) + ' day' if i < 10080 else (str(i//10080) + ' wk' if i < 43200 else (str(i//43200) + ' mo' if i < 525600 else str(i//525600) + ' yr')))) for i in intervals], ['off']], one_time_keyboard=True, resize_keyboard=True)
@@ -672,16 +1393,9 @@ async def delete(update: Update, ctx: CallbackContext):
             parse_mode=None
         )
     utid = int(args[0])
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
-    row = cur.fetchone()
-    if not row:
-        conn.close()
+    deleted = await db_execute("DELETE FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
+    if not deleted:
         return await update.message.reply_text("Task not found or you do not have permission to delete it.")
-    tid = row[0]
-    conn.execute("DELETE FROM tasks WHERE id=?", (tid,))
-    conn.commit()
-    conn.close()
     await update.message.reply_text(f"Task {utid} deleted.")
 
 # Update user menu to include /edit and /del
@@ -704,6 +1418,9 @@ async def slash_menu(update: Update, ctx: CallbackContext):
         "/edit      — Edit your task (/edit <TASK_ID>)\n"
         "/del       — Delete your task (/del <TASK_ID>)\n"
         "/info      — Show task info (/info <TASK_ID>)\n"
+        "/export    — Download your tasks (/export [csv|jsonl])\n"
+        "/import    — Upload tasks from a CSV/JSONL file\n"
+        "/digest    — Group due reminders into one message (/digest on|off)\n"
         "/menu      — Show this menu\n"
         "\n\nAt any time:\n ⏩ /skip \n 🔚 /cancel"
     )
@@ -735,6 +1452,9 @@ async def admin_menu(update: Update, ctx: CallbackContext):
         "/audel USER_ID [CHAT_ID|all] — Delete all tasks for a user (optionally in a specific chat or all chats)\n"
         "/achats — List all chat IDs with tasks\n"
         "/ausers — List all user IDs with tasks\n"
+        "/aexplain — Show query plans for the hot queries\n"
+        "/astats perf — Per-handler latency, DB time and query counts (`/astats perf reset` to clear)\n"
+        "/export [csv|jsonl] all — Export every task in every chat\n"
         "/ablock USER_ID — Block a user from using the bot\n"
         "/aunblock USER_ID — Unblock a user\n"
         "/alogin — Log in as admin\n"
@@ -755,46 +1475,7 @@ async def alist(update: Update, ctx: CallbackContext):
     if not is_admin_user(update):
         return await update.message.reply_text("❌ You must be an admin to use this command.")
     args = ctx.args
-    conn = sqlite3.connect(DB_PATH)
-    if args and args[0] == "all":
-        cur = conn.execute(
-            "SELECT chat_id, user_id, id, description, remind_at, is_done, topic, subject FROM tasks ORDER BY chat_id, user_id, is_done, remind_at"
-        )
-        rows = cur.fetchall()
-        if not rows:
-            conn.close()
-            return await update.message.reply_text("No tasks found in any chat.")
-        lines = []
-        for chat_id, uid, tid, desc, remind_at, is_done, topic, subject in rows:
-            status = "✅ done" if is_done else "⏳ active"
-            extra = ""
-            if topic:
-                extra += f"[Topic: {topic}] "
-            if subject:
-                extra += f"[Subject: {subject}] "
-            lines.append(f"Chat {chat_id} | User {uid}: Task {tid} — {extra}{desc}\n    • due: {remind_at} | {status}")
-        conn.close()
-        await update.message.reply_text("\n\n".join(lines))
-    else:
-        chat_id = update.effective_chat.id
-        cur = conn.execute(
-            "SELECT user_id, id, description, remind_at, is_done, topic, subject FROM tasks WHERE chat_id=? ORDER BY user_id, is_done, remind_at",
-            (chat_id,)
-        )
-        rows = cur.fetchall()
-        conn.close()
-        if not rows:
-            return await update.message.reply_text("No tasks found in this chat.")
-        lines = []
-        for uid, tid, desc, remind_at, is_done, topic, subject in rows:
-            status = "✅ done" if is_done else "⏳ active"
-            extra = ""
-            if topic:
-                extra += f"[Topic: {topic}] "
-            if subject:
-                extra += f"[Subject: {subject}] "
-            lines.append(f"User {uid}: Task {tid} — {extra}{desc}\n    • due: {remind_at} | {status}")
-        await update.message.reply_text("\n\n".join(lines))
+    await send_task_page(update, "aa" if args and args[0] == "all" else "a")
 
 # Admin Edit (global)
 @block_check
@@ -841,11 +1522,8 @@ async def aedit(update: Update, ctx: CallbackContext):
             "Nothing to edit. Provide desc=, due=, topic=, subject=, or interval=.",
             parse_mode=ParseMode.MARKDOWN
         )
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id, remind_at FROM tasks WHERE id=?", (tid,))
-    row = cur.fetchone()
+    row = await db_fetchone("SELECT id, remind_at FROM tasks WHERE id=?", (tid,))
     if not row:
-        conn.close()
         return await update.message.reply_text("Task not found.")
     updates = []
     params = []
@@ -853,13 +1531,11 @@ async def aedit(update: Update, ctx: CallbackContext):
         updates.append("description=?")
         params.append(desc)
     if due is not None:
-        from dateparser import parse as parse_date
-        dt = parse_date(due)
+        dt = parse_datetime(due)
         if not dt:
-            conn.close()
             return await update.message.reply_text("Invalid due date format.")
-        updates.append("remind_at=?")
-        params.append(dt.isoformat())
+        updates.append("remind_at=?, next_reminder_at=?, remind_ts=?, next_reminder_ts=?")
+        params.extend([dt.isoformat(), dt.isoformat(), to_epoch(dt), to_epoch(dt)])
     if topic is not None:
         updates.append("topic=?")
         params.append(topic)
@@ -868,21 +1544,21 @@ async def aedit(update: Update, ctx: CallbackContext):
         params.append(subject)
     params.append(tid)
     if updates:
-        conn.execute(f"UPDATE tasks SET {', '.join(updates)} WHERE id=?", params)
-        conn.commit()
+        await db_execute(f"UPDATE tasks SET {', '.join(updates)} WHERE id=?", params)
+        if due is not None:
+            reminder_scheduler.notify(dt)
     # Set interval if provided, else prompt
     if interval is not None:
         mins = parse_interval_label(interval)
         if mins is None:
-            conn.close()
             return await update.message.reply_text("❌ Could not parse interval. Use e.g. '30 min', '1 hr', or 'off'. Example: interval=30 min")
-        set_question_prefs(tid, mins, 1 if mins > 0 else 0)
+        await run_db(set_question_prefs, tid, mins, 1 if mins > 0 else 0)
         await update.message.reply_text(f"Task {tid} updated. Reminding interval: {interval}")
     else:
         # Prompt for interval
         remind_at = row[1]
         if remind_at:
-            dt2 = dateparser.parse(remind_at)
+            dt2 = parse_datetime(remind_at)
             if dt2:
                 from telegram import ReplyKeyboardMarkup
                 intervals = get_dynamic_intervals(dt2)
@@ -895,7 +1571,6 @@ async def aedit(update: Update, ctx: CallbackContext):
                 interval_task_map[update.effective_user.id] = tid
         else:
             await update.message.reply_text(f"Task {tid} updated.")
-    conn.close()
 
 # Admin Done (global)
 @block_check
@@ -913,14 +1588,9 @@ async def adone(update: Update, ctx: CallbackContext):
     if not args or not args[0].isdigit():
         return await update.message.reply_text("Usage: /adone TASK_ID")
     tid = int(args[0])
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id FROM tasks WHERE id=?", (tid,))
-    if not cur.fetchone():
-        conn.close()
+    if not await db_fetchone("SELECT id FROM tasks WHERE id=?", (tid,)):
         return await update.message.reply_text("Task not found.")
-    conn.execute("UPDATE tasks SET is_done=1 WHERE id=?", (tid,))
-    conn.commit()
-    conn.close()
+    await run_db(mark_done, tid, admin=True)
     await update.message.reply_text(f"Task {tid} marked as done.")
 
 # Admin Delete Task (global)
@@ -939,14 +1609,8 @@ async def adel(update: Update, ctx: CallbackContext):
     if not args or not args[0].isdigit():
         return await update.message.reply_text("Usage: /adel TASK_ID")
     tid = int(args[0])
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id FROM tasks WHERE id=?", (tid,))
-    if not cur.fetchone():
-        conn.close()
+    if not await db_execute("DELETE FROM tasks WHERE id=?", (tid,)):
         return await update.message.reply_text("Task not found.")
-    conn.execute("DELETE FROM tasks WHERE id=?", (tid,))
-    conn.commit()
-    conn.close()
     await update.message.reply_text(f"Task {tid} deleted.")
 
 # Admin User List (global)
@@ -962,19 +1626,16 @@ async def aulist(update: Update, ctx: CallbackContext):
     if not is_admin_user(update):
         return await update.message.reply_text("❌ You must be an admin to use this command.")
     args = ctx.args
-    conn = sqlite3.connect(DB_PATH)
     if args and args[0] == "all":
-        cur = conn.execute("SELECT DISTINCT user_id, chat_id FROM tasks WHERE user_id IS NOT NULL")
-        users = [f"User {row[0]} in Chat {row[1]}" for row in cur.fetchall()]
-        conn.close()
+        rows = await db_fetchall("SELECT DISTINCT user_id, chat_id FROM tasks WHERE user_id IS NOT NULL")
+        users = [f"User {row[0]} in Chat {row[1]}" for row in rows]
         if not users:
             return await update.message.reply_text("No users found in any chat.")
         await update.message.reply_text("Users across all chats:\n" + "\n".join(users))
     else:
         chat_id = update.effective_chat.id
-        cur = conn.execute("SELECT DISTINCT user_id FROM tasks WHERE chat_id=?", (chat_id,))
-        users = [str(row[0]) for row in cur.fetchall() if row[0] is not None]
-        conn.close()
+        rows = await db_fetchall("SELECT DISTINCT user_id FROM tasks WHERE chat_id=?", (chat_id,))
+        users = [str(row[0]) for row in rows if row[0] is not None]
         if not users:
             return await update.message.reply_text("No users found in this chat.")
         await update.message.reply_text("Users in this chat:\n" + "\n".join(users))
@@ -995,25 +1656,16 @@ async def audel(update: Update, ctx: CallbackContext):
     if not args or not args[0].isdigit():
         return await update.message.reply_text("Usage: /audel USER_ID [CHAT_ID|all]")
     uid = int(args[0])
-    conn = sqlite3.connect(DB_PATH)
     if len(args) > 1 and args[1] == "all":
-        cur = conn.execute("SELECT id FROM tasks WHERE user_id=?", (uid,))
-        if not cur.fetchone():
-            conn.close()
+        archived = await db_execute("DELETE FROM tasks_archive WHERE user_id=?", (uid,))
+        if not await db_execute("DELETE FROM tasks WHERE user_id=?", (uid,)) and not archived:
             return await update.message.reply_text("No tasks found for this user in any chat.")
-        conn.execute("DELETE FROM tasks WHERE user_id=?", (uid,))
-        conn.commit()
-        conn.close()
         await update.message.reply_text(f"All tasks for user {uid} deleted in all chats.")
     else:
         chat_id = int(args[1]) if len(args) > 1 and args[1].isdigit() else update.effective_chat.id
-        cur = conn.execute("SELECT id FROM tasks WHERE chat_id=? AND user_id=?", (chat_id, uid))
-        if not cur.fetchone():
-            conn.close()
+        archived = await db_execute("DELETE FROM tasks_archive WHERE chat_id=? AND user_id=?", (chat_id, uid))
+        if not await db_execute("DELETE FROM tasks WHERE chat_id=? AND user_id=?", (chat_id, uid)) and not archived:
             return await update.message.reply_text("No tasks found for this user in this chat.")
-        conn.execute("DELETE FROM tasks WHERE chat_id=? AND user_id=?", (chat_id, uid))
-        conn.commit()
-        conn.close()
         await update.message.reply_text(f"All tasks for user {uid} deleted in chat {chat_id}.")
 
 # Admin Block
@@ -1032,7 +1684,7 @@ async def ablock(update: Update, ctx: CallbackContext):
     if not args or not args[0].isdigit():
         return await update.message.reply_text("Usage: /ablock USER_ID")
     uid = int(args[0])
-    block_user(uid)
+    await run_db(block_user, uid)
     await update.message.reply_text(f"User {uid} is now blocked from using the bot.")
 
 # Admin Unblock
@@ -1052,7 +1704,7 @@ async def aunblock(update: Update, ctx: CallbackContext):
         return await update.message.reply_text("Usage: /aunblock USER_ID")
     uid = int(args[0])
     if is_user_blocked(uid):
-        unblock_user(uid)
+        await run_db(unblock_user, uid)
         await update.message.reply_text(f"User {uid} is now unblocked.")
     else:
         await update.message.reply_text(f"User {uid} was not blocked.")
@@ -1069,10 +1721,8 @@ async def achats(update: Update, ctx: CallbackContext):
     )
     if not is_admin_user(update):
         return await update.message.reply_text("❌ You must be an admin to use this command.")
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT DISTINCT chat_id FROM tasks")
-    chats = [str(row[0]) for row in cur.fetchall()]
-    conn.close()
+    rows = await db_fetchall("SELECT DISTINCT chat_id FROM tasks")
+    chats = [str(row[0]) for row in rows]
     if not chats:
         return await update.message.reply_text("No chats found.")
     await update.message.reply_text("Chats with tasks:\n" + "\n".join(chats))
@@ -1089,14 +1739,269 @@ async def ausers(update: Update, ctx: CallbackContext):
     )
     if not is_admin_user(update):
         return await update.message.reply_text("❌ You must be an admin to use this command.")
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT DISTINCT user_id FROM tasks WHERE user_id IS NOT NULL")
-    users = [str(row[0]) for row in cur.fetchall()]
-    conn.close()
+    rows = await db_fetchall("SELECT DISTINCT user_id FROM tasks WHERE user_id IS NOT NULL")
+    users = [str(row[0]) for row in rows]
     if not users:
         return await update.message.reply_text("No users found.")
     await update.message.reply_text("All users with tasks:\n" + "\n".join(users))
 
+# Admin query-plan report: EXPLAIN QUERY PLAN for every hot query, so a
+# missing or unused index shows up as a full "SCAN tasks".
+def explain_hot_queries():
+    queries = [
+        ("resolve task number", "SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (0, 0, 0)),
+        ("/list first page", task_page_sql("l"), (0, 0, 0)),
+        ("/list next page", task_page_sql("l", keyed=True), (0, 0, 0, "", 0, 0)),
+        ("/list prev page", task_page_sql("l", keyed=True, backward=True), (0, 0, 0, "", 0, 0)),
+        ("/alist next page", task_page_sql("a", keyed=True), (0, 0, 0, "", 0, 0)),
+        ("/alist all next page", task_page_sql("aa", keyed=True), (0, 0, 0, "", 0, 0)),
+        ("/list archived next page", task_page_sql("la", keyed=True), (0, 0, "", 0, 0)),
+        ("due reminders/questions", DUE_TASKS_SQL, (0, 0, "", "")),
+        ("archiver batch", "SELECT id FROM tasks WHERE is_done=1 AND done_ts<=? ORDER BY done_ts LIMIT ?", (0, 1)),
+        ("/aulist", "SELECT DISTINCT user_id FROM tasks WHERE chat_id=?", (0,)),
+        ("/achats", "SELECT DISTINCT chat_id FROM tasks", ()),
+        ("/audel all", "DELETE FROM tasks WHERE user_id=?", (0,)),
+    ]
+    conn = get_db()
+    report = []
+    for label, sql, params in queries:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        flag = "⚠️" if any(step.startswith("SCAN tasks") and "INDEX" not in step for step in plan) else "✅"
+        report.append(f"{flag} {label}\n" + "\n".join(f"    {step}" for step in plan))
+    return "\n".join(report)
+
+@block_check
+async def aexplain(update: Update, ctx: CallbackContext):
+    log_debug_event(
+        event_type="admin_command",
+        title="/aexplain",
+        msg=update.message.text,
+        userid=update.effective_user.id,
+        chatid=update.effective_chat.id,
+    )
+    if not is_admin_user(update):
+        return await update.message.reply_text("❌ You must be an admin to use this command.")
+    await update.message.reply_text("Query plans:\n" + await run_db(explain_hot_queries))
+
+@block_check
+async def astats(update: Update, ctx: CallbackContext):
+    global perf_since
+    log_debug_event(
+        event_type="admin_command",
+        title="/astats",
+        msg=update.message.text,
+        userid=update.effective_user.id,
+        chatid=update.effective_chat.id,
+    )
+    if not is_admin_user(update):
+        return await update.message.reply_text("❌ You must be an admin to use this command.")
+    args = [a.lower() for a in ctx.args or []]
+    if args == ["perf"]:
+        return await update.message.reply_text(format_perf_report())
+    if args == ["perf", "reset"]:
+        handler_stats.clear()
+        db_stats.clear()
+        perf_since = datetime.now()
+        return await update.message.reply_text("✅ Perf stats reset.")
+    await update.message.reply_text("Usage: /astats perf [reset]")
+
+# — Outbound Message Dispatcher —
+
+# Telegram Bot API limits: ~30 msg/s overall, ~1 msg/s per private chat and
+# 20 msg/min per group chat.
+GLOBAL_SEND_RATE = float(os.getenv("GLOBAL_SEND_RATE", "30"))
+PRIVATE_CHAT_SEND_RATE = 1.0
+GROUP_CHAT_SEND_RATE = 20 / 60
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_MAX_PENDING = int(os.getenv("OUTBOX_MAX_PENDING", "10000"))
+OUTBOX_MAX_ATTEMPTS = 5
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        # Seconds until one token is available (0 if one is available now)
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds):
+        # Drain the bucket so nothing goes out for `seconds` (RetryAfter)
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+class MessageDispatcher:
+    """Rate-limited outbound queue for bot.send_message.
+
+    Messages wait in a per-chat FIFO; a chat id sits in the ready queue at most
+    once, so a single worker owns a chat at a time and per-chat order is kept.
+    Workers take a token from the global bucket and the chat's bucket before
+    sending; a chat that is out of tokens is re-queued with call_later instead
+    of parking a worker. RetryAfter and transient network errors are retried,
+    permanent errors (blocked bot, bad request) are logged and dropped.
+    Callers are throttled once OUTBOX_MAX_PENDING messages are waiting.
+    """
+
+    def __init__(self, workers=OUTBOX_WORKERS, max_pending=OUTBOX_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._bot = None
+        self._loop = None
+        self._slots = None
+        self._ready = None
+        self._queues = {}
+        self._buckets = {}
+        self._global = TokenBucket(GLOBAL_SEND_RATE, capacity=GLOBAL_SEND_RATE)
+        self._tasks = []
+
+    def start(self, bot):
+        self._bot = bot
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._ready = asyncio.Queue()
+        self._tasks = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=5):
+        # Give queued messages a moment to drain before cancelling workers
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def send(self, chat_id, text, fires=(), **kwargs):
+        # fires: (kind, scheduled_ts) pairs this message delivers, for the
+        # delivery-lag metric
+        note_sent()  # counted when queued: the worker sending it runs outside the handler
+        await self._slots.acquire()
+        self.pending += 1
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            self._ready.put_nowait(chat_id)
+        queue.append([text, kwargs, 0, fires])
+
+    def send_threadsafe(self, chat_id, text, **kwargs):
+        # For callers outside the event loop (the scheduler tick); returns a
+        # concurrent.futures.Future that resolves once the message is queued.
+        return asyncio.run_coroutine_threadsafe(self.send(chat_id, text, **kwargs), self._loop)
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            rate = GROUP_CHAT_SEND_RATE if chat_id < 0 else PRIVATE_CHAT_SEND_RATE
+            bucket = self._buckets[chat_id] = TokenBucket(rate)
+        return bucket
+
+    def _requeue_later(self, chat_id, delay):
+        self._loop.call_later(delay, self._ready.put_nowait, chat_id)
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._queues[chat_id]
+            bucket = self._bucket(chat_id)
+            wait = bucket.delay()
+            if wait > 0:
+                self._requeue_later(chat_id, wait)
+                continue
+            while (wait := self._global.delay()) > 0:
+                await asyncio.sleep(wait)
+            self._global.take()
+            bucket.take()
+            item = queue[0]
+            text, kwargs, attempts, fires = item
+            try:
+                await self._bot.send_message(chat_id, text, **kwargs)
+                send_outcomes["sent"] += 1
+                sent_at = time.time()
+                for kind, scheduled in fires:
+                    delivery_lag[kind].observe(sent_at - scheduled)
+            except RetryAfter as e:
+                send_errors["RetryAfter"] += 1
+                retry = e.retry_after
+                retry = retry.total_seconds() if isinstance(retry, timedelta) else retry
+                logger.warning(f"Flood control for chat {chat_id}, retrying in {retry}s")
+                bucket.pause(retry)
+                self._requeue_later(chat_id, retry)
+                continue
+            except (BadRequest, Forbidden) as e:
+                send_errors[type(e).__name__] += 1
+                send_outcomes["dropped"] += 1
+                logger.warning(f"Dropping message to chat {chat_id}: {e}")
+            except NetworkError as e:
+                send_errors[type(e).__name__] += 1
+                if attempts + 1 < OUTBOX_MAX_ATTEMPTS:
+                    item[2] = attempts + 1
+                    logger.warning(f"Send to chat {chat_id} failed ({e}), retry {attempts + 1}")
+                    self._requeue_later(chat_id, 2 ** attempts)
+                    continue
+                send_outcomes["dropped"] += 1
+                logger.error(f"Giving up on message to chat {chat_id}: {e}")
+            except TelegramError as e:
+                send_errors[type(e).__name__] += 1
+                send_outcomes["dropped"] += 1
+                logger.warning(f"Dropping message to chat {chat_id}: {e}")
+            except Exception as e:
+                send_errors[type(e).__name__] += 1
+                send_outcomes["dropped"] += 1
+                logger.exception(f"Unexpected error sending to chat {chat_id}")
+            queue.popleft()
+            self.pending -= 1
+            self._slots.release()
+            if queue:
+                self._ready.put_nowait(chat_id)
+            else:
+                del self._queues[chat_id]
+
+outbox = MessageDispatcher()
+
+# — Clock —
+# Scheduling code reads the time from `clock` rather than datetime.now(), so
+# simulate.py can swap in a SimulatedClock and replay months of reminders in
+# seconds. now() is naive local time, like everything stored in the DB.
+class Clock:
+    def now(self):
+        return datetime.now()
+
+    def time(self):
+        return time.time()
+
+class SimulatedClock(Clock):
+    """A clock that only moves when told to."""
+
+    def __init__(self, start):
+        self._ts = float(start)
+
+    def now(self):
+        return datetime.fromtimestamp(self._ts)
+
+    def time(self):
+        return self._ts
+
+    def set(self, ts):
+        self._ts = max(self._ts, float(ts))
+
+    def advance(self, seconds):
+        self._ts += seconds
+
+clock = Clock()
+
 # — Reminder Scheduler —
 
 def safe_parse(dt_str):
@@ -1108,6 +2013,15 @@ def safe_parse(dt_str):
             return None
     return None
 
+def to_epoch(value):
+    """Naive local datetime (or ISO string) -> UTC epoch seconds."""
+    if isinstance(value, str):
+        value = safe_parse(value)
+    return int(value.timestamp()) if value else None
+
+def from_epoch(ts):
+    return datetime.fromtimestamp(ts) if ts is not None else None
+
 
 # --- Inline Action Buttons for Reminders/Questions ---
 def build_task_action_keyboard(task_id, enable_reenable=False):
@@ -1121,70 +2035,348 @@ def build_task_action_keyboard(task_id, enable_reenable=False):
         buttons.insert(1, [InlineKeyboardButton("Reenable", callback_data=f"taskact|reenable|{task_id}")])
     return InlineKeyboardMarkup(buttons)
 
+# --- Digest Messages ---
+# Chats in digest mode get one message per tick listing everything that fell
+# due, instead of a reminder plus an info message per task. Each task keeps a
+# one-row keyboard; the trailing "|d" tells task_action_handler to drop that
+# row rather than overwrite the whole digest.
+DIGEST_MAX_TASKS = 25  # 3 buttons per task stays under Telegram's 100-button limit
+DIGEST_DESC_MAX = 80
+
+def build_digest_keyboard(entries):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"#{utid} Done", callback_data=f"taskact|done|{tid}|d"),
+         InlineKeyboardButton("Snooze", callback_data=f"taskact|snooze|{tid}|d"),
+         InlineKeyboardButton("Dismiss", callback_data=f"taskact|dismiss|{tid}|d")]
+        for _, tid, utid, _ in entries
+    ])
+
+def build_digest_messages(entries):
+    """Split a chat's (kind, task_id, user_task_id, desc) entries into digest messages.
+
+    Plain text rather than Markdown: one description with a stray `*` or `_`
+    would otherwise make Telegram reject the whole digest.
+    """
+    messages = []
+    for start in range(0, len(entries), DIGEST_MAX_TASKS):
+        chunk = entries[start:start + DIGEST_MAX_TASKS]
+        lines = [f"🔔 {len(entries)} tasks need attention:" if start == 0 else "🔔 (continued)"]
+        for kind, _, utid, desc in chunk:
+            if len(desc) > DIGEST_DESC_MAX:
+                desc = desc[:DIGEST_DESC_MAX - 1] + "…"
+            lines.append(f"{'⏰' if kind == 'reminder' else '❓'} #{utid} {desc}")
+        messages.append(("\n".join(lines), build_digest_keyboard(chunk)))
+    return messages
+
+def drop_task_row(markup, task_id):
+    """Return `markup` without the buttons acting on `task_id` (None if nothing is left)."""
+    suffix = f"|{task_id}|d"
+    rows = [row for row in markup.inline_keyboard
+            if not any((b.callback_data or "").endswith(suffix) for b in row)] if markup else []
+    return InlineKeyboardMarkup(rows) if rows else None
+
 # --- Reminder Scheduler ---
-def check_reminders(app, loop):
-    now = datetime.now()
+DUE_TASK_COLUMNS = (
+    "id,chat_id,description,question_interval,question_enabled,"
+    "next_question_ts,next_reminder_ts,next_question_at,next_reminder_at,user_task_id,remind_at"
+)
+
+# Due-window query: each branch is answered from a partial index
+# (idx_tasks_due_reminder / idx_tasks_due_question) with an integer range
+# scan, so only the rows that fire at `now` are read. The IS NULL branches
+# pick up rows the epoch backfill has not reached yet, comparing their ISO
+# text instead; once the backfill is done they find nothing.
+DUE_TASKS_SQL = (
+    f"SELECT {DUE_TASK_COLUMNS} FROM tasks "
+    "WHERE is_done=0 AND next_reminder_ts<=? "
+    "UNION "
+    f"SELECT {DUE_TASK_COLUMNS} FROM tasks "
+    "WHERE is_done=0 AND question_enabled=1 AND next_question_ts<=? "
+    "UNION "
+    f"SELECT {DUE_TASK_COLUMNS} FROM tasks "
+    "WHERE is_done=0 AND next_reminder_ts IS NULL AND next_reminder_at<=? "
+    "UNION "
+    f"SELECT {DUE_TASK_COLUMNS} FROM tasks "
+    "WHERE is_done=0 AND question_enabled=1 AND next_question_ts IS NULL AND next_question_at<=?"
+)
+
+# Due rows handled (and committed) per batch within one tick
+TICK_CHUNK = 500
+
+def fetch_due_tasks(conn, now):
+    now_ts, now_str = to_epoch(now), now.isoformat()
+    return conn.execute(DUE_TASKS_SQL, (now_ts, now_ts, now_str, now_str)).fetchall()
+
+def check_reminders():
+    """Fire every due reminder/question; returns (task_id, kind, scheduled_ts) per fire.
+
+    Runs off the event loop (in an executor) and hands the messages to the
+    outbox, blocking while the outbox is full. Every fired row is moved to a
+    later fire time, so the scheduler's next MIN() lookup moves forward.
+    Due rows are handled TICK_CHUNK at a time and each chunk's new fire times
+    are committed before its messages are queued: a crash mid-tick can lose
+    the chunk in flight, but never resends the ones already out.
+    """
+    started = time.perf_counter()
+    now = clock.now()
     logger.info(f"🔎 check_reminders @ {now.isoformat()}")
 
-    # Use context manager and fetch all rows first
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.execute(
-            "SELECT id,chat_id,description,question_interval,question_enabled,"
-            "next_question_at,next_reminder_at,user_task_id,remind_at FROM tasks WHERE is_done=0"
-        )
-        rows = cur.fetchall()
-    logger.info(f"   → {len(rows)} tasks loaded")
-
-    for tid, chat_id, desc, qi, qon, nq_str, nr_str, user_task_id, remind_at in rows:
-        # Safely parse datetimes
-        next_q = safe_parse(nq_str)
-        next_r = safe_parse(nr_str) or now
-        logger.info(f"Task {tid}: now={now}, next_q={next_q}, next_r={next_r}, qon={qon}, qi={qi}")
-
-        # question reminders until due time
-        if qon and next_q and next_q <= now and next_r > now:
-            logger.info(f"Task {tid}: Sending QUESTION (next_q <= now and next_r > now)")
-            asyncio.run_coroutine_threadsafe(
-                app.bot.send_message(
-                    chat_id,
-                    f"❓ Are you still working on *{desc}*? (task #{user_task_id})",
-                    parse_mode="Markdown",
-                    reply_markup=build_task_action_keyboard(tid, enable_reenable=False)
-                ),
-                loop
-            )
-            # Reopen connection only for update
-            with sqlite3.connect(DB_PATH) as conn:
-                conn.execute(
-                    "UPDATE tasks SET next_question_at=? WHERE id=?",
-                    ((next_q + timedelta(minutes=qi)).isoformat(), tid)
-                )
-            # Send reminder info after question
-            send_reminder_info(chat_id, user_task_id, remind_at, qi, app.bot, loop)
-
-        # due reminders at and after due time
-        if next_r <= now:
-            logger.info(f"Task {tid}: Sending REMINDER (next_r <= now)")
-            asyncio.run_coroutine_threadsafe(
-                app.bot.send_message(
-                    chat_id,
-                    f"⏰ Reminder: *{desc}* (task #{user_task_id})",
-                    parse_mode="Markdown",
-                    reply_markup=build_task_action_keyboard(tid, enable_reenable=True)
-                ),
-                loop
+    # Use context manager and fetch only the due rows
+    with get_db() as conn:
+        rows = fetch_due_tasks(conn, now)
+    logger.info(f"   → {len(rows)} due tasks loaded")
+
+    fires = []
+    digests = {}  # chat_id -> [(kind, task_id, user_task_id, desc)]
+    digest_fires = {}  # chat_id -> [(kind, scheduled_ts)]
+    now_ts = to_epoch(now)
+    for start in range(0, len(rows), TICK_CHUNK):
+        question_updates = []
+        reminder_updates = []
+        outgoing = []  # (chat_id, text, send kwargs), in send order
+        for tid, chat_id, desc, qi, qon, next_q, next_r, nq_str, nr_str, user_task_id, remind_at in rows[start:start + TICK_CHUNK]:
+            # Integer epoch seconds; rows not yet backfilled fall back to the ISO text
+            if next_q is None:
+                next_q = to_epoch(nq_str)
+            if next_r is None:
+                next_r = to_epoch(nr_str) or now_ts
+            logger.debug(f"Task {tid}: now={now_ts}, next_q={next_q}, next_r={next_r}, qon={qon}, qi={qi}")
+            bump = qi * 60 if qi > 0 else 60
+
+            digest = digests.setdefault(chat_id, []) if chat_id in digest_chat_ids else None
+
+            # question reminders until due time
+            if qon and next_q and next_q <= now_ts and next_r > now_ts:
+                logger.debug(f"Task {tid}: Sending QUESTION (next_q <= now and next_r > now)")
+                new_q = next_fire_after(next_q, bump, now_ts)
+                question_updates.append((from_epoch(new_q).isoformat(), new_q, tid))
+                fires.append((tid, "question", next_q))
+                if digest is not None:
+                    digest.append(("question", tid, user_task_id, desc))
+                    digest_fires.setdefault(chat_id, []).append(("question", next_q))
+                    continue
+                outgoing.append((chat_id, f"❓ Are you still working on *{desc}*? (task #{user_task_id})", {
+                    "fires": [("question", next_q)],
+                    "parse_mode": "Markdown",
+                    "reply_markup": build_task_action_keyboard(tid, enable_reenable=False),
+                }))
+                # Send reminder info after question
+                outgoing.append((chat_id, reminder_info_text(user_task_id, remind_at, qi), {}))
+
+            # due reminders at and after due time
+            if next_r <= now_ts:
+                logger.debug(f"Task {tid}: Sending REMINDER (next_r <= now)")
+                new_r = next_fire_after(next_r, bump, now_ts)
+                reminder_updates.append((from_epoch(new_r).isoformat(), new_r, tid))
+                fires.append((tid, "reminder", next_r))
+                if qon and next_q and next_q <= now_ts:
+                    # Questions stop at the due time; keep the stale one from
+                    # pinning the scheduler's next wakeup in the past
+                    question_updates.append((from_epoch(new_r).isoformat(), new_r, tid))
+                if digest is not None:
+                    digest.append(("reminder", tid, user_task_id, desc))
+                    digest_fires.setdefault(chat_id, []).append(("reminder", next_r))
+                    continue
+                outgoing.append((chat_id, f"⏰ Reminder: *{desc}* (task #{user_task_id})", {
+                    "fires": [("reminder", next_r)],
+                    "parse_mode": "Markdown",
+                    "reply_markup": build_task_action_keyboard(tid, enable_reenable=True),
+                }))
+                # Send reminder info after reminder
+                outgoing.append((chat_id, reminder_info_text(user_task_id, remind_at, qi), {}))
+
+        # Persist the chunk's new fire times before anything goes out
+        if question_updates or reminder_updates:
+            with get_db() as conn:
+                conn.executemany("UPDATE tasks SET next_question_at=?, next_question_ts=? WHERE id=?", question_updates)
+                conn.executemany("UPDATE tasks SET next_reminder_at=?, next_reminder_ts=? WHERE id=?", reminder_updates)
+        for chat_id, text, kwargs in outgoing:
+            outbox.send_threadsafe(chat_id, text, **kwargs).result()
+
+    # One message per digest chat (per DIGEST_MAX_TASKS tasks) for the whole
+    # tick; every chunk feeding them is committed by now
+    for chat_id, entries in digests.items():
+        messages = build_digest_messages(entries)
+        for i, (text, markup) in enumerate(messages):
+            # The digest's fires count as delivered once its last part is out
+            fired = digest_fires[chat_id] if i == len(messages) - 1 else ()
+            outbox.send_threadsafe(chat_id, text, fires=fired, reply_markup=markup).result()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    fired = Counter(kind for _, kind, _ in fires)
+    tick_duration.observe(elapsed_ms)
+    tick_totals["ticks"] += 1
+    tick_totals["scanned"] += len(rows)
+    tick_totals.update(fired)
+    logger.info(
+        f"   → tick done in {elapsed_ms:.1f} ms: {len(rows)} due, "
+        f"{fired['question']} questions, {fired['reminder']} reminders, "
+        f"{len(digests)} digests"
+    )
+    return fires
+
+def next_fire_after(last, bump, now):
+    # Keep the task's cadence, but never schedule into the past: a task that
+    # fell behind (e.g. the bot was offline) fires once now, not once per
+    # missed interval in a burst.
+    nxt = last + bump
+    return nxt if nxt > now else now + bump
+
+# Earliest pending fire time. Each branch is a MIN() over a partial index,
+# so it is a single index seek however many tasks there are; as with
+# DUE_TASKS_SQL, the ISO branches only matter until the backfill finishes.
+NEXT_DUE_SQL = (
+    "SELECT MIN(next_reminder_ts) FROM tasks WHERE is_done=0",
+    "SELECT MIN(next_question_ts) FROM tasks WHERE is_done=0 AND question_enabled=1",
+)
+NEXT_DUE_ISO_SQL = (
+    "SELECT MIN(next_reminder_at) FROM tasks WHERE is_done=0 AND next_reminder_ts IS NULL",
+    "SELECT MIN(next_question_at) FROM tasks WHERE is_done=0 AND question_enabled=1 AND next_question_ts IS NULL",
+)
+
+def next_due_ts():
+    """Epoch seconds of the next reminder/question to fire, or None if nothing is pending."""
+    with get_db() as conn:
+        times = [conn.execute(sql).fetchone()[0] for sql in NEXT_DUE_SQL]
+        times += [to_epoch(conn.execute(sql).fetchone()[0]) for sql in NEXT_DUE_ISO_SQL]
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+class ReminderScheduler:
+    """Event-driven reminder engine running inside the bot's event loop.
+
+    Asks the DB for the earliest pending fire time (next_due_ts) and sleeps
+    until then; with nothing pending it sleeps until notified, so an idle bot
+    does no periodic DB work. Writers call notify() with the time they set,
+    which only wakes the engine if that is earlier than its current wakeup.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._next_at = None  # epoch seconds of the planned wakeup, None = idle
+
+    def notify(self, when):
+        # Safe to call from any thread; a no-op until the engine is running.
+        if when is None or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._maybe_wake, when.timestamp())
+
+    def _maybe_wake(self, ts):
+        if self._next_at is None or ts < self._next_at:
+            self._wakeup.set()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        logger.info("⏱️ Reminder scheduler started")
+        while True:
+            self._wakeup.clear()
+            # Until the query returns, any notify() must wake us: a write that
+            # commits after MIN() has read past it would otherwise compare
+            # against the old, already-fired wakeup and be slept through.
+            self._next_at = None
+            try:
+                self._next_at = await self._loop.run_in_executor(None, next_due_ts)
+            except Exception:
+                logger.exception("next_due_ts failed")
+                self._next_at = clock.time() + 60
+            delay = None if self._next_at is None else self._next_at - clock.time()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._loop.run_in_executor(None, check_reminders)
+            except Exception:
+                logger.exception("check_reminders failed")
+                await asyncio.sleep(1)  # don't spin on a persistent failure
+
+reminder_scheduler = ReminderScheduler()
+
+# — Task Archiver —
+# Finished tasks older than ARCHIVE_AFTER_DAYS move from tasks to
+# tasks_archive, so the live table and its indexes only hold what /list,
+# /alist and the scheduler actually work on. Rows move in small batches,
+# each its own short transaction, to keep the writer lock free for handlers.
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "30"))  # 0 disables archiving
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL = int(os.getenv("ARCHIVE_INTERVAL", "3600"))  # seconds between runs
+ARCHIVE_COLUMNS = (
+    "id, chat_id, user_id, user_task_id, description, remind_at, is_done, "
+    "question_interval, topic, subject, remind_ts, done_ts"
+)
+
+def archive_done_tasks(now=None):
+    """Move every archivable task, one batch at a time; returns the count."""
+    now = int(now if now is not None else clock.time())
+    cutoff = now - int(ARCHIVE_AFTER_DAYS * 86400)
+    conn = get_db()
+    moved = 0
+    while True:
+        with conn:
+            ids = [tid for (tid,) in conn.execute(
+                "SELECT id FROM tasks WHERE is_done=1 AND done_ts<=? ORDER BY done_ts LIMIT ?",
+                (cutoff, ARCHIVE_BATCH_SIZE)
+            )]
+            if not ids:
+                break
+            marks = ",".join("?" * len(ids))
+            conn.execute(
+                f"INSERT OR REPLACE INTO tasks_archive ({ARCHIVE_COLUMNS}, archived_ts) "
+                f"SELECT {ARCHIVE_COLUMNS}, ? FROM tasks WHERE id IN ({marks})",
+                (now, *ids)
             )
-            bump = timedelta(minutes=qi) if qi > 0 else timedelta(minutes=1)
-            with sqlite3.connect(DB_PATH) as conn:
-                conn.execute(
-                    "UPDATE tasks SET next_reminder_at=? WHERE id=?",
-                    ((next_r + bump).isoformat(), tid)
-                )
-            # Send reminder info after reminder
-            send_reminder_info(chat_id, user_task_id, remind_at, qi, app.bot, loop)
+            conn.execute(f"DELETE FROM tasks WHERE id IN ({marks})", ids)
+        moved += len(ids)
+        time.sleep(0.01)  # let queued writers in between batches
+    return moved
+
+class TaskArchiver:
+    def __init__(self):
+        self._task = None
+
+    def start(self):
+        if ARCHIVE_AFTER_DAYS > 0:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                started = time.perf_counter()
+                moved = await loop.run_in_executor(DB_EXECUTOR, archive_done_tasks)
+                if moved:
+                    logger.info(f"🗄️ Archived {moved} done tasks in {time.perf_counter() - started:.1f} s")
+            except Exception:
+                logger.exception("archive_done_tasks failed")
+            await asyncio.sleep(ARCHIVE_INTERVAL)
 
-    conn.commit()
-    conn.close()
+task_archiver = TaskArchiver()
 
 # --- Task Action Callback Handler ---
 async def task_action_handler(update, context):
@@ -1196,37 +2388,47 @@ async def task_action_handler(update, context):
         userid=query.from_user.id,
         chatid=query.message.chat_id,
     )
-    await query.answer()
     data = query.data
     parts = data.split("|")
-    if len(parts) != 3 or parts[0] != "taskact":
+    if len(parts) not in (3, 4) or parts[0] != "taskact":
+        await query.answer()
         return
     action, tid = parts[1], int(parts[2])
+    digest = len(parts) == 4 and parts[3] == "d"
+    if not digest:
+        await query.answer()
+
+    async def reply(text):
+        # A digest lists other tasks too: toast the result and drop only this task's row
+        if digest:
+            await query.answer(text)
+            await query.edit_message_reply_markup(drop_task_row(query.message.reply_markup, tid))
+        else:
+            await query.edit_message_text(text)
+
     # Fetch task info if needed
     if action == "snooze":
         # For demo, snooze 10 minutes
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.execute("SELECT next_reminder_at FROM tasks WHERE id=?", (tid,))
-            row = cur.fetchone()
-            if row and row[0]:
-                next_r = safe_parse(row[0]) or datetime.now()
-                new_time = next_r + timedelta(minutes=10)
-                conn.execute(
-                    "UPDATE tasks SET next_reminder_at=?, next_question_at=? WHERE id=?",
-                    (new_time.isoformat(), new_time.isoformat(), tid)
-                )
-                conn.commit()
-                await query.edit_message_text("🔕 Snoozed for 10 minutes.")
+        row = await db_fetchone("SELECT next_reminder_at FROM tasks WHERE id=?", (tid,))
+        if row and row[0]:
+            next_r = safe_parse(row[0]) or clock.now()
+            new_time = next_r + timedelta(minutes=10)
+            await db_execute(
+                "UPDATE tasks SET next_reminder_at=?, next_question_at=?, next_reminder_ts=?, next_question_ts=? WHERE id=?",
+                (new_time.isoformat(), new_time.isoformat(), to_epoch(new_time), to_epoch(new_time), tid)
+            )
+            reminder_scheduler.notify(new_time)
+            await reply("🔕 Snoozed for 10 minutes.")
+        elif digest:
+            await query.answer()
     elif action == "dismiss":
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.execute("UPDATE tasks SET question_enabled=0, question_interval=0 WHERE id=?", (tid,))
-            conn.commit()
-            await query.edit_message_text("🔕 Reminders/questions dismissed for this task.")
+        await db_execute("UPDATE tasks SET question_enabled=0, question_interval=0 WHERE id=?", (tid,))
+        await reply("🔕 Reminders/questions dismissed for this task.")
     elif action == "reenable":
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.execute("UPDATE tasks SET question_enabled=1 WHERE id=?", (tid,))
-            conn.commit()
-            await query.edit_message_text("🔔 Reminders/questions re-enabled for this task.")
+        await db_execute("UPDATE tasks SET question_enabled=1 WHERE id=?", (tid,))
+        row = await db_fetchone("SELECT next_question_at FROM tasks WHERE id=?", (tid,))
+        reminder_scheduler.notify(safe_parse(row[0]) if row else None)
+        await reply("🔔 Reminders/questions re-enabled for this task.")
     elif action == "edit":
         # Start edit wizard for this task
         context.user_data.clear()
@@ -1234,8 +2436,8 @@ async def task_action_handler(update, context):
         await query.edit_message_text("✏️ Let's edit this task. Please enter the new description (or type /skip to keep current):")
         return EDIT_DESC
     elif action == "done":
-        mark_done(tid, admin=True)
-        await query.edit_message_text("✅ Task marked as done.")
+        await run_db(mark_done, tid, admin=True)
+        await reply("✅ Task marked as done.")
 
 # --- Edit Wizard States ---
 EDIT_DESC, EDIT_DATE, EDIT_TIME, EDIT_TOPIC, EDIT_SUBJECT, EDIT_INTERVAL, EDIT_CONFIRM = range(100, 107)
@@ -1268,7 +2470,7 @@ async def edit_desc_skip(update, context):
 async def edit_date(update, context):
     log_edit_wizard_step("edit_date", f"called, text='{update.message.text.strip()}'")
     text = update.message.text.strip()
-    dt = dateparser.parse(text)
+    dt = parse_datetime(text)
     if not dt:
         log_edit_wizard_step("edit_date", f"could not parse '{text}'")
         await update.message.reply_text("❌ Could not parse date. Enter again or /skip:")
@@ -1289,7 +2491,7 @@ async def edit_date_skip(update, context):
 async def edit_time(update, context):
     log_edit_wizard_step("edit_time", f"called, text='{update.message.text.strip()}'")
     text = update.message.text.strip()
-    dt = dateparser.parse(text)
+    dt = parse_datetime(text)
     if not dt or not dt.time():
         log_edit_wizard_step("edit_time", f"could not parse '{text}'")
         await update.message.reply_text("❌ Could not parse time. Enter again or /skip:")
@@ -1329,15 +2531,13 @@ async def edit_subject(update, context):
     context.user_data['edit_subject'] = text
     log_edit_wizard_step("edit_subject", f"got subject='{text}'")
     tid = context.user_data['edit_task_id']
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.execute("SELECT remind_at, question_interval FROM tasks WHERE id=?", (tid,))
-        row = cur.fetchone()
-        remind_at, old_interval = row if row else (None, 0)
+    row = await db_fetchone("SELECT remind_at, question_interval FROM tasks WHERE id=?", (tid,))
+    remind_at, old_interval = row if row else (None, 0)
     if context.user_data.get('edit_date') and context.user_data.get('edit_time'):
         from datetime import datetime as dt
         due_dt = dt.combine(context.user_data['edit_date'], context.user_data['edit_time'])
     elif remind_at:
-        due_dt = dateparser.parse(remind_at)
+        due_dt = parse_datetime(remind_at)
     else:
         due_dt = None
     if due_dt:
@@ -1359,15 +2559,13 @@ async def edit_subject_skip(update, context):
     context.user_data['edit_subject'] = None
     await update.message.reply_text("Step skipped.")
     tid = context.user_data['edit_task_id']
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.execute("SELECT remind_at, question_interval FROM tasks WHERE id=?", (tid,))
-        row = cur.fetchone()
-        remind_at, old_interval = row if row else (None, 0)
+    row = await db_fetchone("SELECT remind_at, question_interval FROM tasks WHERE id=?", (tid,))
+    remind_at, old_interval = row if row else (None, 0)
     if context.user_data.get('edit_date') and context.user_data.get('edit_time'):
         from datetime import datetime as dt
         due_dt = dt.combine(context.user_data['edit_date'], context.user_data['edit_time'])
     elif remind_at:
-        due_dt = dateparser.parse(remind_at)
+        due_dt = parse_datetime(remind_at)
     else:
         due_dt = None
     if due_dt:
@@ -1405,13 +2603,11 @@ async def edit_interval_skip(update, context):
 
 async def edit_confirm(update, context, is_query=False):
     tid = context.user_data['edit_task_id']
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.execute("SELECT description, remind_at, topic, subject, question_interval FROM tasks WHERE id=?", (tid,))
-        row = cur.fetchone()
-        old_desc, old_due, old_topic, old_subject, old_interval = row if row else ("", "", "", "", 0)
+    row = await db_fetchone("SELECT description, remind_at, topic, subject, question_interval FROM tasks WHERE id=?", (tid,))
+    old_desc, old_due, old_topic, old_subject, old_interval = row if row else ("", "", "", "", 0)
     desc = context.user_data.get('edit_desc') or old_desc
-    due = context.user_data.get('edit_date') or (dateparser.parse(old_due).date() if old_due else None)
-    time = context.user_data.get('edit_time') or (dateparser.parse(old_due).time() if old_due else None)
+    due = context.user_data.get('edit_date') or (parse_datetime(old_due).date() if old_due else None)
+    time = context.user_data.get('edit_time') or (parse_datetime(old_due).time() if old_due else None)
     topic = context.user_data.get('edit_topic') or old_topic
     subject = context.user_data.get('edit_subject') or old_subject
     interval = context.user_data.get('edit_interval')
@@ -1435,13 +2631,11 @@ async def edit_confirm_cb(update, context):
     query = update.callback_query
     if query.data == "editconfirm":
         tid = context.user_data['edit_task_id']
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.execute("SELECT description, remind_at, topic, subject, question_interval, user_task_id, chat_id FROM tasks WHERE id=?", (tid,))
-            row = cur.fetchone()
-            old_desc, old_due, old_topic, old_subject, old_interval, user_task_id, chat_id = row if row else ("", "", "", "", 0, 0, 0)
+        row = await db_fetchone("SELECT description, remind_at, topic, subject, question_interval, user_task_id, chat_id FROM tasks WHERE id=?", (tid,))
+        old_desc, old_due, old_topic, old_subject, old_interval, user_task_id, chat_id = row if row else ("", "", "", "", 0, 0, 0)
         desc = context.user_data.get('edit_desc') or old_desc
-        due = context.user_data.get('edit_date') or (dateparser.parse(old_due).date() if old_due else None)
-        time = context.user_data.get('edit_time') or (dateparser.parse(old_due).time() if old_due else None)
+        due = context.user_data.get('edit_date') or (parse_datetime(old_due).date() if old_due else None)
+        time = context.user_data.get('edit_time') or (parse_datetime(old_due).time() if old_due else None)
         topic = context.user_data.get('edit_topic') or old_topic
         subject = context.user_data.get('edit_subject') or old_subject
         interval = context.user_data.get('edit_interval')
@@ -1453,18 +2647,22 @@ async def edit_confirm_cb(update, context):
             remind_at = dt.combine(due, time).isoformat()
         else:
             remind_at = old_due
-        with sqlite3.connect(DB_PATH) as conn:
-            conn.execute("UPDATE tasks SET description=?, remind_at=?, topic=?, subject=?, question_interval=? WHERE id=?", (desc, remind_at, topic, subject, interval, tid))
-            conn.commit()
+        if remind_at != old_due:
+            await db_execute(
+                "UPDATE tasks SET description=?, remind_at=?, next_reminder_at=?, remind_ts=?, next_reminder_ts=?, "
+                "topic=?, subject=?, question_interval=? WHERE id=?",
+                (desc, remind_at, remind_at, to_epoch(remind_at), to_epoch(remind_at), topic, subject, interval, tid)
+            )
+            reminder_scheduler.notify(safe_parse(remind_at))
+        else:
+            await db_execute("UPDATE tasks SET description=?, remind_at=?, topic=?, subject=?, question_interval=? WHERE id=?", (desc, remind_at, topic, subject, interval, tid))
         # Fetch interval for this task
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.execute("SELECT remind_at, question_interval, user_task_id, chat_id FROM tasks WHERE id=?", (tid,))
-            row = cur.fetchone()
+        row = await db_fetchone("SELECT remind_at, question_interval, user_task_id, chat_id FROM tasks WHERE id=?", (tid,))
         remind_at, interval, user_task_id, chat_id = row if row else (None, 0, 0, 0)
         # Calculate reminder info
         if remind_at and interval and interval > 0:
-            due_dt = dateparser.parse(remind_at)
-            now = dt.now()
+            due_dt = parse_datetime(remind_at)
+            now = clock.now()
             mins_until_due = int((due_dt - now).total_seconds() // 60)
             num_reminders = max(1, mins_until_due // interval)
             next_reminder = now + timedelta(minutes=interval)
@@ -1473,7 +2671,7 @@ async def edit_confirm_cb(update, context):
         else:
             await query.edit_message_text("Task updated!\nNo reminders will be sent.")
         # Send reminder info after update
-        send_reminder_info(chat_id, user_task_id, remind_at, interval, context.bot, asyncio.get_event_loop())
+        await outbox.send(chat_id, reminder_info_text(user_task_id, remind_at, interval))
     else:
         await query.edit_message_text("Edit cancelled.")
     try:
@@ -1510,64 +2708,86 @@ def is_admin_user(update):
     user_id = update.effective_user.id
     return is_admin_logged_in(user_id)
 
-# Helper: check if user is blocked (DB)
+# block_check runs on every update, so blocked users and admin sessions are
+# mirrored in memory: loaded once at startup, then kept in step by the
+# functions below that change the tables.
+blocked_user_ids = set()
+admin_session_ids = set()
+
+def load_access_cache():
+    conn = get_db()
+    blocked_user_ids.clear()
+    blocked_user_ids.update(uid for (uid,) in conn.execute("SELECT user_id FROM blocked_users"))
+    admin_session_ids.clear()
+    admin_session_ids.update(uid for (uid,) in conn.execute("SELECT user_id FROM admin_sessions"))
+    digest_chat_ids.clear()
+    digest_chat_ids.update(cid for (cid,) in conn.execute("SELECT chat_id FROM chat_settings WHERE digest=1"))
+
+# Chats that get one digest per scheduler tick (see check_reminders); read
+# from the tick's executor thread, written only via set_chat_digest.
+digest_chat_ids = set()
+
+def set_chat_digest(chat_id, enabled):
+    with get_db() as conn:
+        conn.execute(
+            "INSERT INTO chat_settings (chat_id, digest) VALUES (?, ?) "
+            "ON CONFLICT(chat_id) DO UPDATE SET digest=excluded.digest",
+            (chat_id, int(enabled))
+        )
+    if enabled:
+        digest_chat_ids.add(chat_id)
+    else:
+        digest_chat_ids.discard(chat_id)
+
+# Helper: check if user is blocked (cached)
 def is_user_blocked(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT 1 FROM blocked_users WHERE user_id=?", (user_id,))
-    blocked = cur.fetchone() is not None
-    conn.close()
-    return blocked
+    return user_id in blocked_user_ids
 
-# Helper: check if user is admin logged in (DB)
+# Helper: check if user is admin logged in (cached)
 def is_admin_logged_in(user_id):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT 1 FROM admin_sessions WHERE user_id=?", (user_id,))
-    logged_in = cur.fetchone() is not None
-    conn.close()
-    return logged_in
+    return user_id in admin_session_ids
 
 # Admin login: add to admin_sessions table
 def admin_login(user_id, username):
     from datetime import datetime
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     conn.execute(
         "INSERT OR REPLACE INTO admin_sessions (user_id, username, login_time) VALUES (?, ?, ?)",
         (user_id, username, datetime.now().isoformat())
     )
     conn.commit()
-    conn.close()
+    admin_session_ids.add(user_id)
 
 # Admin logout: remove from admin_sessions table
 def admin_logout(user_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     conn.execute("DELETE FROM admin_sessions WHERE user_id=?", (user_id,))
     conn.commit()
-    conn.close()
+    admin_session_ids.discard(user_id)
 
 # Block user: add to blocked_users table
 def block_user(user_id):
     from datetime import datetime
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     conn.execute(
         "INSERT OR REPLACE INTO blocked_users (user_id, blocked_at) VALUES (?, ?)",
         (user_id, datetime.now().isoformat())
     )
     conn.commit()
-    conn.close()
+    blocked_user_ids.add(user_id)
 
 # Unblock user: remove from blocked_users table
 def unblock_user(user_id):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     conn.execute("DELETE FROM blocked_users WHERE user_id=?", (user_id,))
     conn.commit()
-    conn.close()
+    blocked_user_ids.discard(user_id)
 
 def migrate_legacy_tasks():
-    conn = sqlite3.connect(DB_PATH)
-    # Set user_id = chat_id where user_id is NULL (legacy private chat tasks)
-    conn.execute("UPDATE tasks SET user_id = chat_id WHERE user_id IS NULL")
-    conn.commit()
-    conn.close()
+    conn = get_db()
+    # Migration 7 already did this at startup; the command stays for admins who run it by hand
+    with conn:
+        assign_legacy_owners(conn)
 
 @block_check
 async def migrate_legacy_tasks_cmd(update: Update, ctx: CallbackContext):
@@ -1581,7 +2801,7 @@ async def migrate_legacy_tasks_cmd(update: Update, ctx: CallbackContext):
     user_id = update.effective_user.id
     if not is_admin_logged_in(user_id):
         return await update.message.reply_text("❌ You must be an admin to use this command.")
-    migrate_legacy_tasks()
+    await run_db(migrate_legacy_tasks)
     await update.message.reply_text("✅ Legacy tasks migrated: user_id set to chat_id where missing.")
 
 @block_check
@@ -1627,18 +2847,17 @@ async def aadd(update: Update, ctx: CallbackContext):
             parse_mode="HTML"
         )
     desc, _, timestr = text.rpartition(" at ")
-    from dateparser import parse as parse_date
-    dt = parse_date(timestr)
+    dt = parse_datetime(timestr)
     if not dt:
         return await update.message.reply_text("❌ Could not parse date/time.")
     chat_id = update.effective_chat.id
-    task_id, user_task_id = add_task(chat_id, user_id, desc, dt, topic, subject)
+    task_id, user_task_id = await run_db(add_task, chat_id, user_id, desc, dt, topic, subject)
     # If interval provided, set it, else prompt
     if interval:
         mins = parse_interval_label(interval)
         if mins is None:
             return await update.message.reply_text("❌ Could not parse interval. Use e.g. '30 min', '1 hr', or 'off'.")
-        set_question_prefs(task_id, mins, 1 if mins > 0 else 0)
+        await run_db(set_question_prefs, task_id, mins, 1 if mins > 0 else 0)
         details = f"_" + desc + "_"
         if topic:
             details = f"[Topic: {topic}] " + details
@@ -1669,8 +2888,7 @@ async def aadd(update: Update, ctx: CallbackContext):
 # Helper: generate dynamic interval options based on due date
 
 def get_dynamic_intervals(due_dt):
-    from datetime import datetime
-    now = datetime.now()
+    now = clock.now()
     delta = due_dt - now
     minutes = delta.total_seconds() / 60
     days = delta.total_seconds() / 86400
@@ -1731,7 +2949,7 @@ def parse_power_user_entry(text):
     text = text.strip()
     if " at " in text:
         desc, _, timestr = text.rpartition(" at ")
-        dt = dateparser.parse(timestr)
+        dt = parse_datetime(timestr)
         if dt:
             return desc.strip(), dt, topic, subject
     return None, None, None, None
@@ -1747,7 +2965,7 @@ async def task_desc(update, context):
 
 async def task_date(update, context):
     text = update.message.text.strip()
-    dt = dateparser.parse(text)
+    dt = parse_datetime(text)
     if not dt:
         await update.message.reply_text("❌ Could not understand the date. Please enter a valid date (e.g., 'tomorrow', '2025-07-15') or pick from the calendar.")
         return TASK_DATE
@@ -1798,7 +3016,7 @@ async def calendar_handler(update, context):
 
 async def task_time(update, context):
     text = update.message.text.strip()
-    dt = dateparser.parse(text)
+    dt = parse_datetime(text)
     if not dt or not dt.time():
         await update.message.reply_text("❌ Please enter a valid time (e.g., '18:00', '8pm') or pick from the buttons.")
         return TASK_TIME
@@ -1928,11 +3146,11 @@ async def confirm_handler(update, context):
         due_dt = datetime.combine(data['date'], data['time'])
         chat_id = query.message.chat_id
         user_id = query.from_user.id
-        task_id, user_task_id = add_task(chat_id, user_id, data['desc'], due_dt, data.get('topic'), data.get('subject'))
-        set_question_prefs(task_id, data['interval'], 1 if data['interval'] > 0 else 0)
+        task_id, user_task_id = await run_db(add_task, chat_id, user_id, data['desc'], due_dt, data.get('topic'), data.get('subject'))
+        await run_db(set_question_prefs, task_id, data['interval'], 1 if data['interval'] > 0 else 0)
         # Calculate reminder info
         interval = data['interval']
-        now = datetime.now()
+        now = clock.now()
         if interval > 0:
             mins_until_due = int((due_dt - now).total_seconds() // 60)
             num_reminders = max(1, mins_until_due // interval)
@@ -2003,12 +3221,72 @@ def build_interval_keyboard(intervals):
     return keyboard
 
 # — Main Entrypoint —
+# — Concurrent update processing —
+# Updates from different users run in parallel on up to UPDATE_WORKERS
+# workers, while each (chat, user) pair is processed strictly in arrival
+# order, so the /add and /edit wizards never see one user's messages out of
+# sequence. PTB's own semaphore is held while an update waits for its user
+# lock, so it only bounds how many updates may be in flight; the worker
+# limit is applied after the lock is taken, keeping one busy user from
+# tying up every worker.
+UPDATE_MAX_PENDING = 4096
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, workers, max_pending=UPDATE_MAX_PENDING):
+        super().__init__(max(workers, max_pending))
+        self.workers = workers
+        self._worker_slots = None
+        self._locks = {}  # (chat_id, user_id) -> [lock, holders + waiters]
+
+    async def initialize(self):
+        self._worker_slots = asyncio.Semaphore(self.workers)
+
+    async def shutdown(self):
+        self._locks.clear()
+
+    @staticmethod
+    def update_key(update):
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat
+        user = update.effective_user
+        if chat is None and user is None:
+            return None
+        return (chat.id if chat else None, user.id if user else None)
+
+    async def do_process_update(self, update, coroutine):
+        key = self.update_key(update)
+        if key is None:
+            async with self._worker_slots:
+                return await coroutine
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                async with self._worker_slots:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
 def main():
     print("\n\nDEBUG: main() called\n\n")  # Debug print to confirm main() is being called
     init_db()
-    app = ApplicationBuilder().token(config.TELEGRAM_TOKEN).build()
-    import asyncio
-    loop = asyncio.get_event_loop()  # Store the main event loop
+    load_access_cache()
+    app = (
+        ApplicationBuilder()
+        .token(config.TELEGRAM_TOKEN)
+        .base_url(f"{config.TELEGRAM_API_URL}/bot")
+        .base_file_url(f"{config.TELEGRAM_API_URL}/file/bot")
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .concurrent_updates(PerUserUpdateProcessor(config.UPDATE_WORKERS))
+        .request(CountingRequest(connection_pool_size=256))
+        .build()
+    )
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('add', start_add)],
@@ -2057,6 +3335,8 @@ def main():
         }
     )
     app.add_handler(edit_conv)
+    track_conversation("add", conv_handler)
+    track_conversation("edit", edit_conv)
 
     # Register task action handler for inline buttons right after the wizards
     app.add_handler(CallbackQueryHandler(task_action_handler, pattern=r"^taskact\|"))
@@ -2064,11 +3344,16 @@ def main():
     # Now register all other command handlers
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("list", listall))
+    app.add_handler(CallbackQueryHandler(list_page_cb, pattern=r"^pg\|"))
     app.add_handler(CommandHandler("done", done_cmd))
     app.add_handler(CallbackQueryHandler(question_interval_cb, pattern=r"^qi\\|"))
     app.add_handler(CommandHandler("edit", edit))
     app.add_handler(CommandHandler("del", delete))
     app.add_handler(CommandHandler("info", info_cmd))
+    app.add_handler(CommandHandler("export", export_cmd))
+    app.add_handler(CommandHandler("import", import_cmd))
+    app.add_handler(CommandHandler("digest", digest_cmd))
+    app.add_handler(MessageHandler(filters.Document.ALL, import_document))
     app.add_handler(CommandHandler("alogin", alogin))
     app.add_handler(CommandHandler("alogout", alogout))
     app.add_handler(CommandHandler("menu", slash_menu))
@@ -2083,17 +3368,315 @@ def main():
     app.add_handler(CommandHandler("aunblock", aunblock))
     app.add_handler(CommandHandler("achats", achats))
     app.add_handler(CommandHandler("ausers", ausers))
+    app.add_handler(CommandHandler("aexplain", aexplain))
+    app.add_handler(CommandHandler("astats", astats))
     app.add_handler(CommandHandler("migrate_legacy_tasks", migrate_legacy_tasks_cmd))
     app.add_handler(CommandHandler("aadd", aadd))
 
     # Move the generic MessageHandler to the very end
     app.add_handler(MessageHandler(None, interval_reply_handler))
 
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(check_reminders, "interval", minutes=1, args=(app, loop))
-    scheduler.start()
+    for group in app.handlers.values():
+        instrument_handlers(group)
+
+    if config.BOT_MODE == "webhook":
+        asyncio.run(run_webhook(app))
+    else:
+        app.run_polling()
+
+async def on_startup(app):
+    outbox.start(app.bot)
+    if config.METRICS_PORT:
+        await metrics_server.start()
+    reminder_scheduler.start()
+    task_archiver.start()
+    migrations = asyncio.get_running_loop().run_in_executor(None, run_online_migrations)
+    migrations.add_done_callback(log_online_migration_errors)
+
+async def on_shutdown(app):
+    await reminder_scheduler.stop()
+    await task_archiver.stop()
+    await outbox.stop()
+    await metrics_server.stop()
+    close_db()
+    debug_log_writer.close()
+
+# — Webhook mode —
+# A deliberately small HTTP/1.1 listener on asyncio streams: Telegram only
+# ever POSTs JSON updates, so this avoids pulling in a web framework. Each
+# update is validated against WEBHOOK_SECRET, acknowledged immediately and
+# handed to the application's update queue, where PerUserUpdateProcessor
+# runs it.
+WEBHOOK_MAX_BODY = 1024 * 1024
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+                405: "Method Not Allowed", 413: "Payload Too Large"}
+
+async def read_http_request(reader):
+    """Return (method, path, headers, body), or None on EOF/garbage."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        return None
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        return None
+    if length > WEBHOOK_MAX_BODY:
+        return method, path, headers, None
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    return method, path, headers, body
+
+def http_response(status, body=b"", content_type="text/plain; charset=utf-8", close=False):
+    head = (
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+class WebhookServer:
+    def __init__(self, app, listen, port, path, secret):
+        self.app = app
+        self.listen = listen
+        self.port = port
+        self.path = path
+        self.secret = secret.encode()
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        logging.info(f"🌐 Webhook listening on {self.listen}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _route(self, method, path, headers, body):
+        if path == "/healthz":
+            return 200
+        if path.split("?", 1)[0] != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        token = headers.get("x-telegram-bot-api-secret-token", "").encode()
+        if not hmac.compare_digest(token, self.secret):
+            return 403
+        if body is None:
+            return 413
+        try:
+            update = Update.de_json(json.loads(body), self.app.bot)
+        except (ValueError, TypeError, KeyError):
+            return 400
+        self.app.update_queue.put_nowait(update)
+        return 200
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_http_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status = self._route(method, path, headers, body)
+                close = status == 413 or headers.get("connection", "").lower() == "close"
+                writer.write(http_response(status, close=close))
+                await writer.drain()
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+async def run_webhook(app):
+    # Mirrors run_polling's lifecycle, with our own listener instead of the Updater
+    server = WebhookServer(app, config.WEBHOOK_LISTEN, config.WEBHOOK_PORT,
+                           config.WEBHOOK_PATH, config.WEBHOOK_SECRET)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # e.g. Windows; KeyboardInterrupt still ends asyncio.run
+    await app.initialize()
+    try:
+        await on_startup(app)
+        await app.start()
+        await server.start()
+        if config.WEBHOOK_URL:
+            await app.bot.set_webhook(
+                url=config.WEBHOOK_URL,
+                secret_token=config.WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=max(1, min(100, config.UPDATE_WORKERS * 5)),
+            )
+        await stop.wait()
+    finally:
+        await server.stop()
+        if app.running:
+            await app.stop()
+        await on_shutdown(app)
+        await app.shutdown()
+
+# — Metrics endpoint —
+# Optional Prometheus text-format /metrics on METRICS_LISTEN:METRICS_PORT,
+# served by the same small asyncio listener code as webhook mode, in the
+# bot's own event loop. The counters below are bumped where things happen
+# (outbox worker, scheduler tick); a scrape only reads them.
+LAG_BUCKETS_S = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 900, 3600)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+delivery_lag = {"reminder": Histogram(LAG_BUCKETS_S), "question": Histogram(LAG_BUCKETS_S)}  # seconds late
+tick_duration = Histogram()  # ms
+tick_totals = Counter()  # ticks, scanned, reminder, question
+send_outcomes = Counter()  # sent / dropped
+send_errors = Counter()  # exception name -> failed attempts (retried ones included)
+active_wizards = {}  # conversation name -> {(chat_id, user_id)} part-way through it
+
+def track_conversation(name, conv):
+    """Keep active_wizards[name] in step with `conv` from the states its callbacks return.
+
+    This mirrors ConversationHandler's own rules: a callback returning END
+    finishes the conversation, None leaves it as it was, any other state
+    starts or continues it.
+    """
+    users = active_wizards.setdefault(name, set())
+
+    def tracked(func):
+        @wraps(func)
+        async def wrapper(update, ctx, *args, **kwargs):
+            state = await func(update, ctx, *args, **kwargs)
+            chat, user = update.effective_chat, update.effective_user
+            key = (chat.id if chat else None, user.id if user else None)
+            if state == ConversationHandler.END:
+                users.discard(key)
+            elif state is not None:
+                users.add(key)
+            return state
+        return wrapper
+
+    for handler in (*conv.entry_points, *(h for hs in conv.states.values() for h in hs), *conv.fallbacks):
+        handler.callback = tracked(handler.callback)
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items()) + "}"
+
+def render_metrics():
+    lines = []
 
-    app.run_polling()
+    def header(name, kind, help_text):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def sample(name, value, **labels):
+        lines.append(f"{name}{_labels(**labels)} {value}")
+
+    def histogram(name, help_text, histograms, label=None, scale=1.0):
+        # scale converts the Histogram's unit (ms for PERF_BUCKETS_MS ones) to seconds
+        header(name, "histogram", help_text)
+        for key, hist in histograms.items():
+            extra = {label: key} if label else {}
+            seen = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                seen += n
+                sample(f"{name}_bucket", seen, **extra, le=f"{bound * scale:g}")
+            sample(f"{name}_bucket", hist.count, **extra, le="+Inf")
+            sample(f"{name}_sum", f"{hist.total * scale:.6f}", **extra)
+            sample(f"{name}_count", hist.count, **extra)
+
+    histogram("taskbot_reminder_delivery_lag_seconds",
+              "Time from a reminder/question's scheduled fire time until its message was sent.",
+              delivery_lag, label="kind")
+    header("taskbot_scheduler_ticks_total", "counter", "check_reminders runs.")
+    sample("taskbot_scheduler_ticks_total", tick_totals["ticks"])
+    header("taskbot_scheduler_tasks_scanned_total", "counter", "Due rows loaded by check_reminders.")
+    sample("taskbot_scheduler_tasks_scanned_total", tick_totals["scanned"])
+    header("taskbot_scheduler_fires_total", "counter", "Reminders and questions fired.")
+    for kind in ("reminder", "question"):
+        sample("taskbot_scheduler_fires_total", tick_totals[kind], kind=kind)
+    histogram("taskbot_scheduler_tick_duration_seconds", "check_reminders wall time.",
+              {None: tick_duration}, scale=0.001)
+    header("taskbot_outbox_messages_total", "counter", "Outbox messages sent, or dropped after errors.")
+    for outcome in ("sent", "dropped"):
+        sample("taskbot_outbox_messages_total", send_outcomes[outcome], outcome=outcome)
+    header("taskbot_outbox_send_errors_total", "counter", "Failed send attempts by error type.")
+    for error, n in sorted(send_errors.items()):
+        sample("taskbot_outbox_send_errors_total", n, error=error)
+    header("taskbot_outbox_pending", "gauge", "Messages waiting in the outbox.")
+    sample("taskbot_outbox_pending", outbox.pending)
+    histogram("taskbot_db_call_duration_seconds", "Time spent awaiting each run_db helper.",
+              {name: st.wall for name, st in db_stats.items()}, label="helper", scale=0.001)
+    histogram("taskbot_handler_duration_seconds", "Handler wall time.",
+              {name: st.wall for name, st in handler_stats.items()}, label="handler", scale=0.001)
+    header("taskbot_active_conversations", "gauge", "Users part-way through the /add or /edit wizard.")
+    for name, users in active_wizards.items():
+        sample("taskbot_active_conversations", len(users), conversation=name)
+    return ("\n".join(lines) + "\n").encode()
+
+class MetricsServer:
+    def __init__(self, listen, port):
+        self.listen = listen
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        logging.info(f"📈 Metrics on http://{self.listen}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request = await read_http_request(reader)
+                if request is None:
+                    break
+                method, path, headers, _ = request
+                close = headers.get("connection", "").lower() == "close"
+                path = path.split("?", 1)[0]
+                if path == "/healthz":
+                    writer.write(http_response(200, close=close))
+                elif path != "/metrics":
+                    writer.write(http_response(404, close=close))
+                elif method != "GET":
+                    writer.write(http_response(405, close=close))
+                else:
+                    writer.write(http_response(200, render_metrics(), METRICS_CONTENT_TYPE, close=close))
+                await writer.drain()
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+metrics_server = MetricsServer(config.METRICS_LISTEN, config.METRICS_PORT)
 
 # Catch-all message logger
 async def log_all_messages(update: Update, ctx: CallbackContext):
@@ -2131,28 +3714,35 @@ async def info_cmd(update: Update, ctx: CallbackContext):
     utid = int(args[0])
     user_id = update.effective_user.id
     chat_id = update.effective_chat.id
-    with sqlite3.connect(DB_PATH) as conn:
-        cur = conn.execute(
-            "SELECT id, description, remind_at, is_done, topic, subject, question_interval, question_enabled, next_reminder_at FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?",
+    row = await db_fetchone(
+        "SELECT id, description, remind_at, is_done, topic, subject, question_interval, question_enabled, next_reminder_at FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?",
+        (chat_id, user_id, utid)
+    )
+    archived = False
+    if not row:
+        # Finished tasks move to the archive after a while
+        row = await db_fetchone(
+            "SELECT id, description, remind_at, is_done, topic, subject, question_interval, 0, NULL FROM tasks_archive WHERE chat_id=? AND user_id=? AND user_task_id=?",
             (chat_id, user_id, utid)
         )
-        row = cur.fetchone()
+        archived = True
     if not row:
         return await update.message.reply_text("Task not found.")
     tid, desc, remind_at, is_done, topic, subject, interval, enabled, next_reminder_at = row
     status = "✅ Done" if is_done else "🕒 Active"
+    if archived:
+        status += " (archived)"
     due = remind_at if remind_at else "—"
     topic = topic or "—"
     subject = subject or "—"
     interval_str = f"{interval} min" if interval and enabled else "No reminders"
     # Calculate reminders left and next reminder
     if remind_at and interval and enabled:
-        from datetime import datetime as dt
-        due_dt = dateparser.parse(remind_at)
-        now = dt.now()
+        due_dt = parse_datetime(remind_at)
+        now = clock.now()
         mins_until_due = int((due_dt - now).total_seconds() // 60)
         num_reminders = max(1, mins_until_due // interval)
-        next_reminder = dateparser.parse(next_reminder_at) if next_reminder_at else None
+        next_reminder = parse_datetime(next_reminder_at) if next_reminder_at else None
         next_reminder_str = next_reminder.strftime('%Y-%m-%d %H:%M') if next_reminder else "—"
     else:
         num_reminders = 0
@@ -2170,26 +3760,308 @@ async def info_cmd(update: Update, ctx: CallbackContext):
     )
     await update.message.reply_text(summary, parse_mode="Markdown")
 
+# — Bulk export / import —
+# /export streams rows straight from SQLite cursors into a temporary file
+# and uploads it as a document; /import reads an uploaded CSV or JSON Lines
+# file one row at a time and inserts valid rows in batched transactions,
+# reporting the rows it rejected. Memory use is bounded by one batch.
+EXPORT_COLUMNS = (
+    "chat_id", "user_id", "user_task_id", "description", "remind_at",
+    "is_done", "topic", "subject", "question_interval",
+)
+EXPORT_FETCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_BYTES = 20 * 1024 * 1024  # Bot API getFile download limit
+IMPORT_MAX_ERRORS_SHOWN = 20
+IMPORT_DESC_MAX = 4000
+
+def export_tasks(fmt, chat_id=None, user_id=None):
+    """Write matching live and archived tasks to a temp file, rewound."""
+    where, params = "", ()
+    if chat_id is not None:
+        where, params = " WHERE chat_id=? AND user_id=?", (chat_id, user_id)
+    cols = ", ".join(EXPORT_COLUMNS)
+    out = tempfile.TemporaryFile()
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text) if fmt == "csv" else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+    conn = get_db()
+    count = 0
+    for table in ("tasks", "tasks_archive"):
+        cur = conn.execute(f"SELECT {cols} FROM {table}{where} ORDER BY id", params)
+        while True:
+            rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                if writer:
+                    writer.writerow(row)
+                else:
+                    text.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n")
+            count += len(rows)
+    text.flush()
+    text.detach()
+    out.seek(0)
+    return out, count
+
+def iter_import_rows(f, fmt):
+    """Yield (line_no, dict) from a binary file, or (line_no, error string).
+
+    line_no is None for a problem with the file as a whole; reading stops there.
+    """
+    text = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    try:
+        yield from (_iter_csv_rows(text) if fmt == "csv" else _iter_jsonl_rows(text))
+    except UnicodeDecodeError:
+        # The decoder works on whole chunks, so there is no resuming after this
+        yield None, "not UTF-8 text; stopped reading here"
+
+def _iter_csv_rows(text):
+    reader = csv.DictReader(text)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:  # e.g. a NUL byte or an oversized field; the reader moves on
+            yield reader.line_num, f"bad CSV ({e})"
+            continue
+        yield reader.line_num, row
+
+def _iter_jsonl_rows(text):
+    for line_no, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, "not valid JSON"
+            continue
+        yield line_no, row if isinstance(row, dict) else "expected a JSON object"
+
+def parse_import_row(row, chat_id, user_id, admin):
+    """Validate one imported row; returns the insert parameters or raises ValueError."""
+    def field(name):
+        value = row.get(name)
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+
+    desc = field("description")
+    if not desc:
+        raise ValueError("description is required")
+    if len(desc) > IMPORT_DESC_MAX:
+        raise ValueError(f"description longer than {IMPORT_DESC_MAX} characters")
+    due_text = field("remind_at")
+    due = parse_datetime(due_text) if due_text else None
+    if not due:
+        raise ValueError(f"invalid remind_at {due_text!r}")
+    done_text = (field("is_done") or "0").lower()
+    if done_text not in ("0", "1", "true", "false", "yes", "no"):
+        raise ValueError(f"invalid is_done {done_text!r}")
+    done = done_text in ("1", "true", "yes")
+    interval_text = field("question_interval") or "0"
+    if not interval_text.isdigit():
+        raise ValueError(f"invalid question_interval {interval_text!r}")
+    interval = int(interval_text)
+    if admin:
+        # Admins may import for other users/chats (e.g. an /export all file)
+        for name in ("chat_id", "user_id"):
+            value = field(name)
+            if value is not None and not value.lstrip("-").isdigit():
+                raise ValueError(f"invalid {name} {value!r}")
+        chat_id = int(field("chat_id") or chat_id)
+        user_id = int(field("user_id") or user_id)
+    next_q = clock.now() + timedelta(minutes=interval) if interval and not done else None
+    return {
+        "chat_id": chat_id,
+        "user_id": user_id,
+        "description": desc,
+        "due": due,
+        "is_done": int(done),
+        "done_ts": int(clock.time()) if done else None,
+        "topic": field("topic"),
+        "subject": field("subject"),
+        "question_interval": interval,
+        "next_q": next_q,
+    }
+
+def insert_import_batch(conn, batch):
+    # One transaction per batch; each (chat, user) reserves its numbers at once
+    with conn:
+        groups = {}
+        for item in batch:
+            groups.setdefault((item["chat_id"], item["user_id"]), []).append(item)
+        for (chat_id, user_id), items in groups.items():
+            first = reserve_user_task_ids(conn, chat_id, user_id, len(items))
+            for offset, item in enumerate(items):
+                item["user_task_id"] = first + offset
+        conn.executemany(
+            "INSERT INTO tasks (chat_id, user_id, user_task_id, description, remind_at, next_reminder_at, "
+            "remind_ts, next_reminder_ts, is_done, done_ts, topic, subject, question_interval, "
+            "question_enabled, next_question_at, next_question_ts) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            [
+                (i["chat_id"], i["user_id"], i["user_task_id"], i["description"],
+                 i["due"].isoformat(), i["due"].isoformat(), to_epoch(i["due"]), to_epoch(i["due"]),
+                 i["is_done"], i["done_ts"], i["topic"], i["subject"], i["question_interval"],
+                 int(i["next_q"] is not None), i["next_q"].isoformat() if i["next_q"] else None,
+                 to_epoch(i["next_q"]))
+                for i in batch
+            ]
+        )
+    fire_times = [i["due"] for i in batch if not i["is_done"]] + [i["next_q"] for i in batch if i["next_q"]]
+    if fire_times:
+        reminder_scheduler.notify(min(fire_times))
+
+def import_tasks(f, fmt, chat_id, user_id, admin=False):
+    """Import rows from a binary file; returns (imported, errors, error_count)."""
+    conn = get_db()
+    imported, errors, error_count = 0, [], 0
+    batch = []
+    for line_no, row in iter_import_rows(f, fmt):
+        try:
+            if isinstance(row, str):
+                raise ValueError(row)
+            batch.append(parse_import_row(row, chat_id, user_id, admin))
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < IMPORT_MAX_ERRORS_SHOWN:
+                errors.append(f"line {line_no}: {e}" if line_no else f"file: {e}")
+            continue
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            insert_import_batch(conn, batch)
+            imported += len(batch)
+            batch = []
+    if batch:
+        insert_import_batch(conn, batch)
+        imported += len(batch)
+    return imported, errors, error_count
+
+@block_check
+async def export_cmd(update: Update, ctx: CallbackContext):
+    log_debug_event(
+        event_type="command",
+        title="/export",
+        msg=update.message.text,
+        userid=update.effective_user.id,
+        chatid=update.effective_chat.id,
+    )
+    args = [a.lower() for a in ctx.args]
+    fmt = "jsonl" if "jsonl" in args else "csv"
+    user_id = update.effective_user.id
+    chat_id = update.effective_chat.id
+    if "all" in args:
+        if not is_admin_user(update):
+            return await update.message.reply_text("❌ You must be an admin to use this command.")
+        f, count = await run_db(export_tasks, fmt)
+        filename = f"tasks-all.{fmt}"
+    else:
+        f, count = await run_db(export_tasks, fmt, chat_id, user_id)
+        filename = f"tasks-{chat_id}-{user_id}.{fmt}"
+    with f:
+        if not count:
+            return await update.message.reply_text("No tasks to export.")
+        await update.message.reply_document(document=f, filename=filename, caption=f"📦 {count} tasks")
+
+@block_check
+async def import_cmd(update: Update, ctx: CallbackContext):
+    log_debug_event(
+        event_type="command",
+        title="/import",
+        msg=update.message.text,
+        userid=update.effective_user.id,
+        chatid=update.effective_chat.id,
+    )
+    ctx.user_data["awaiting_import"] = True
+    await update.message.reply_text(
+        "📥 Send a .csv or .jsonl file with columns description, remind_at "
+        "and optionally is_done, topic, subject, question_interval "
+        "(the format /export produces)."
+    )
+
+@block_check
+async def import_document(update: Update, ctx: CallbackContext):
+    message = update.message
+    caption = (message.caption or "").strip()
+    if not (ctx.user_data.pop("awaiting_import", False) or caption.startswith("/import")):
+        return
+    log_debug_event(
+        event_type="command",
+        title="/import",
+        msg=message.document.file_name,
+        userid=update.effective_user.id,
+        chatid=update.effective_chat.id,
+    )
+    doc = message.document
+    name = (doc.file_name or "").lower()
+    if name.endswith(".csv"):
+        fmt = "csv"
+    elif name.endswith((".jsonl", ".json", ".ndjson")):
+        fmt = "jsonl"
+    else:
+        return await message.reply_text("❌ Please upload a .csv or .jsonl file.")
+    if doc.file_size and doc.file_size > IMPORT_MAX_BYTES:
+        return await message.reply_text("❌ File too large (Telegram lets bots download up to 20 MB).")
+    admin = is_admin_user(update)
+    with tempfile.TemporaryFile() as f:
+        tg_file = await doc.get_file()
+        await tg_file.download_to_memory(out=f)
+        f.seek(0)
+        started = time.perf_counter()
+        imported, errors, error_count = await run_db(
+            import_tasks, f, fmt, update.effective_chat.id, update.effective_user.id, admin
+        )
+    text = f"✅ Imported {imported} tasks in {time.perf_counter() - started:.1f} s."
+    if error_count:
+        text += f"\n⚠️ {error_count} rows rejected:\n" + "\n".join(errors)
+        if error_count > len(errors):
+            text += f"\n… and {error_count - len(errors)} more"
+    await message.reply_text(text)
+
+# /digest on|off: in groups only chat admins (or bot admins) may switch it
+@block_check
+async def digest_cmd(update: Update, ctx: CallbackContext):
+    log_debug_event(
+        event_type="command",
+        title="/digest",
+        msg=update.message.text,
+        userid=update.effective_user.id,
+        chatid=update.effective_chat.id,
+    )
+    chat = update.effective_chat
+    arg = ctx.args[0].lower() if ctx.args else ""
+    if arg not in ("on", "off"):
+        state = "on" if chat.id in digest_chat_ids else "off"
+        return await update.message.reply_text(
+            f"Digest mode is {state} for this chat.\n"
+            "Usage: /digest on|off — group everything due at once into a single message."
+        )
+    if chat.type != "private" and not is_admin_user(update):
+        member = await ctx.bot.get_chat_member(chat.id, update.effective_user.id)
+        if member.status not in ("administrator", "creator"):
+            return await update.message.reply_text("❌ Only chat admins can change digest mode.")
+    await run_db(set_chat_digest, chat.id, arg == "on")
+    await update.message.reply_text(
+        "📰 Digest mode on: due reminders arrive as one message per check."
+        if arg == "on" else "Digest mode off: one message per reminder."
+    )
+
 # --- Helper: Send reminder info to user ---
-def send_reminder_info(chat_id, user_task_id, remind_at, interval, bot, loop):
-    from datetime import datetime as dt
+def reminder_info_text(user_task_id, remind_at, interval):
     if remind_at and interval and interval > 0:
-        due_dt = dateparser.parse(remind_at)
-        now = dt.now()
+        due_dt = parse_datetime(remind_at)
+        now = clock.now()
         mins_until_due = int((due_dt - now).total_seconds() // 60)
         num_reminders = max(1, mins_until_due // interval)
         next_reminder = now + timedelta(minutes=interval)
-        text = (
+        return (
             f"ℹ️ You will receive about {num_reminders} reminders for task #{user_task_id}.\n"
             f"Next reminder: {next_reminder.strftime('%Y-%m-%d %H:%M')}"
         )
-    else:
-        text = f"ℹ️ No reminders will be sent for task #{user_task_id}."
-    import asyncio
-    asyncio.run_coroutine_threadsafe(
-        bot.send_message(chat_id, text),
-        loop
-    )
+    return f"ℹ️ No reminders will be sent for task #{user_task_id}."
 
 # Add back the missing interval_button_edit_handler for edit wizard
 async def interval_button_edit_handler(update, context):
@@ -2213,10 +4085,7 @@ async def edit_wizard_entry(update, context):
         return await edit(update, context)
     utid = int(args[0])
     # Look up the real task id for this user and chat
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.execute("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
-    row = cur.fetchone()
-    conn.close()
+    row = await db_fetchone("SELECT id FROM tasks WHERE chat_id=? AND user_id=? AND user_task_id=?", (chat_id, user_id, utid))
     if not row:
         return await update.message.reply_text("Task not found or you do not have permission to edit it.")
     tid = row[0]
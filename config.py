@@ -10,3 +10,32 @@ ANOTHER_SERVICE_KEY = os.getenv("ANOTHER_SERVICE_KEY")
 
 if not TELEGRAM_TOKEN:
     raise RuntimeError("Missing TELEGRAM_TOKEN in .env")
+
+# Bot API endpoint; point at a local stub (see fake_telegram.py) for testing
+TELEGRAM_API_URL    = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+
+# — Update delivery —
+# BOT_MODE=polling (default) long-polls getUpdates from a single process.
+# BOT_MODE=webhook runs a local HTTP listener that Telegram (or a reverse
+# proxy in front of it) POSTs updates to. Either way, run one process: the
+# scheduler and wizard/cache state are per process.
+BOT_MODE            = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL         = os.getenv("WEBHOOK_URL")  # public URL registered with setWebhook; unset = register elsewhere
+WEBHOOK_LISTEN      = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT        = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH        = "/" + os.getenv("WEBHOOK_PATH", "telegram").lstrip("/")
+WEBHOOK_SECRET      = os.getenv("WEBHOOK_SECRET")
+
+# Updates handled in parallel (one user's updates always run in order)
+UPDATE_WORKERS      = int(os.getenv("UPDATE_WORKERS", "8"))
+
+# Prometheus /metrics listener; METRICS_PORT=0 (default) leaves it off.
+# Binds to localhost unless told otherwise: scrape it from the same host
+# (or a sidecar) rather than exposing it publicly.
+METRICS_PORT        = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LISTEN      = os.getenv("METRICS_LISTEN", "127.0.0.1")
+
+if BOT_MODE not in ("polling", "webhook"):
+    raise RuntimeError(f"Unknown BOT_MODE {BOT_MODE!r} (expected 'polling' or 'webhook')")
+if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+    raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_SECRET in .env")
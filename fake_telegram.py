@@ -0,0 +1,241 @@
+"""Local stand-in for Telegram, for exercising the bot without the real Bot API.
+
+It serves the Bot API methods the bot calls (getMe, getUpdates, setWebhook,
+sendMessage, editMessageText, answerCallbackQuery, ...), hands synthetic
+updates to the bot (getUpdates in polling mode, POSTs in webhook mode) and
+records every reply per chat. loadtest.py drives it with scripted sessions;
+run on its own it floods the bot's webhook with one command and reports how
+long each took to be answered.
+
+    # terminal 1
+    TELEGRAM_API_URL=http://127.0.0.1:8081 BOT_MODE=webhook WEBHOOK_SECRET=s3cret \
+        WEBHOOK_URL=http://127.0.0.1:8443/telegram python bot.py
+    # terminal 2
+    python fake_telegram.py --secret s3cret --text "/list" --count 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "TaskBot", "username": "task_bot"}
+# Methods that put something in front of the user; each is delivered to the chat's reply queue
+REPLY_METHODS = ("sendMessage", "editMessageText", "editMessageReplyMarkup", "answerCallbackQuery", "sendDocument")
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.message_ids = itertools.count(1)
+        self.update_ids = itertools.count(1)
+        self.callback_ids = itertools.count(1)
+        self.webhook = {}
+        self.calls = Counter()  # method -> count
+        self.sent = []  # (monotonic time, chat_id, method)
+        self.replies = {}  # chat_id -> asyncio.Queue of Reply, for subscribed chats
+        self.callback_chats = {}  # callback_query id -> chat_id, to route answerCallbackQuery
+        self.pending_updates = []  # for getUpdates
+        self.polled = asyncio.Event()  # set once the bot has called getUpdates
+        self._new_updates = asyncio.Event()
+
+    # — Bot API side —
+    async def call(self, method, params):
+        self.calls[method] += 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self.get_updates(params)
+        if method == "setWebhook":
+            self.webhook = params
+            return True
+        if method == "deleteWebhook":
+            self.webhook = {}
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook.get("url", ""), "has_custom_certificate": False, "pending_update_count": 0}
+        if method in REPLY_METHODS:
+            if method == "answerCallbackQuery":
+                chat_id = self.callback_chats.pop(params.get("callback_query_id"), 0)
+            else:
+                chat_id = int(params.get("chat_id", 0))
+            self.sent.append((time.monotonic(), chat_id, method))
+            result = True
+            if method in ("sendMessage", "editMessageText", "sendDocument"):
+                result = self.message(chat_id, params.get("text", ""), BOT_USER)
+                if params.get("message_id"):  # an edit keeps the message's id
+                    result["message_id"] = int(params["message_id"])
+                params["message_id"] = result["message_id"]
+            queue = self.replies.get(chat_id)
+            if queue is not None:
+                queue.put_nowait(Reply(method, params))
+            return result
+        return True  # setMyCommands, ...
+
+    async def get_updates(self, params):
+        self.polled.set()
+        offset = int(params.get("offset") or 0)
+        self.pending_updates = [u for u in self.pending_updates if u["update_id"] >= offset]
+        if not self.pending_updates and float(params.get("timeout") or 0) > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params["timeout"]))
+            except asyncio.TimeoutError:
+                pass
+        return self.pending_updates[:int(params.get("limit") or 100)]
+
+    def message(self, chat_id, text, sender):
+        return {
+            "message_id": next(self.message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": sender,
+            "text": text,
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+                    break  # client went away, or we are shutting down
+                lines = head.decode("latin-1").split("\r\n")
+                _, target, _ = lines[0].split(" ", 2)
+                headers = {k.strip().lower(): v.strip() for k, v in
+                           (line.split(":", 1) for line in lines[1:] if ":" in line)}
+                body = await reader.readexactly(int(headers.get("content-length", "0")))
+                method = urlsplit(target).path.rsplit("/", 1)[-1]
+                if headers.get("content-type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = dict(parse_qsl(body.decode()))
+                try:
+                    result = await self.call(method, params)
+                except asyncio.CancelledError:
+                    break
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        finally:
+            writer.close()
+
+    # — Update side —
+    def text_update(self, chat_id, user_id, text):
+        sender = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        msg = self.message(chat_id, text, sender)
+        if text.startswith("/"):
+            msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": next(self.update_ids), "message": msg}
+
+    def callback_update(self, chat_id, user_id, data, message_id=None):
+        """A button press on one of the bot's messages."""
+        query_id = str(next(self.callback_ids))
+        self.callback_chats[query_id] = chat_id
+        sender = {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+        msg = self.message(chat_id, "", BOT_USER)
+        if message_id is not None:
+            msg["message_id"] = message_id
+        return {
+            "update_id": next(self.update_ids),
+            "callback_query": {"id": query_id, "from": sender, "message": msg, "chat_instance": str(chat_id), "data": data},
+        }
+
+    async def deliver(self, update, secret=None):
+        """Hand an update to the bot the way Telegram would; returns the HTTP status (200 when polled)."""
+        if self.webhook.get("url"):
+            return await post(self.webhook["url"], secret or self.webhook.get("secret_token", ""), update)
+        self.pending_updates.append(update)
+        self._new_updates.set()
+        return 200
+
+    def subscribe(self, chat_id):
+        return self.replies.setdefault(chat_id, asyncio.Queue())
+
+    def unsubscribe(self, chat_id):
+        self.replies.pop(chat_id, None)
+
+
+class Reply:
+    """One bot call that showed something in a chat."""
+
+    def __init__(self, method, params):
+        self.method = method
+        self.at = time.monotonic()
+        self.message_id = params.get("message_id")
+        self.text = params.get("text", "")
+        markup = params.get("reply_markup")
+        if isinstance(markup, str):  # form-encoded requests carry it as JSON text
+            markup = json.loads(markup)
+        self.buttons = [
+            button["callback_data"]
+            for row in (markup or {}).get("inline_keyboard", [])
+            for button in row if "callback_data" in button
+        ]
+
+
+async def post(url, secret, update):
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    body = json.dumps(update).encode()
+    writer.write(
+        f"POST {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    writer.close()
+    return status
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--api-port", type=int, default=8081, help="port for the fake Bot API")
+    parser.add_argument("--webhook", help="bot webhook URL (default: whatever the bot registers)")
+    parser.add_argument("--secret", required=True, help="WEBHOOK_SECRET the bot expects")
+    parser.add_argument("--text", default="/list", help="message text to send")
+    parser.add_argument("--count", type=int, default=10, help="number of updates")
+    parser.add_argument("--chats", type=int, default=1, help="spread updates over this many private chats")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for each reply")
+    args = parser.parse_args()
+
+    fake = FakeTelegram()
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", args.api_port)
+    print(f"Fake Bot API on http://127.0.0.1:{args.api_port}")
+    async with server:
+        while not (args.webhook or fake.webhook.get("url")):
+            await asyncio.sleep(0.2)  # wait for the bot to call setWebhook
+        url = args.webhook or fake.webhook["url"]
+        locks = {}
+
+        async def one(i):
+            chat_id = 1000 + i % args.chats
+            async with locks.setdefault(chat_id, asyncio.Lock()):  # one outstanding request per chat
+                replies = fake.subscribe(chat_id)
+                start = time.monotonic()
+                status = await post(url, args.secret, fake.text_update(chat_id, chat_id, args.text))
+                try:
+                    if status != 200:
+                        return None
+                    await asyncio.wait_for(replies.get(), args.timeout)
+                except asyncio.TimeoutError:
+                    return None
+                finally:
+                    fake.unsubscribe(chat_id)
+                return time.monotonic() - start
+
+        latencies = await asyncio.gather(*(one(i) for i in range(args.count)))
+        ok = sorted(x for x in latencies if x is not None)
+        print(f"{len(ok)}/{args.count} updates answered")
+        if ok:
+            print(f"reply latency p50={ok[len(ok) // 2] * 1000:.1f}ms "
+                  f"p99={ok[min(len(ok) - 1, int(len(ok) * 0.99))] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
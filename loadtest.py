@@ -0,0 +1,338 @@
+"""End-to-end load test: scripted users drive the real bot through fake_telegram.py.
+
+Starts the fake Bot API, launches bot.py against it with a scratch database
+(polling by default, --mode webhook for the webhook listener) and lets
+--users simulated users replay scripted sessions for --duration seconds:
+one-line /add entries, the full /add wizard, /list + /done, and a reminder
+that is snoozed and dismissed from its buttons. Every step waits for the
+bot's answer, so the numbers are end-to-end latencies through the real
+handlers, conversation states and database.
+
+    python loadtest.py --users 50 --duration 60 --out load.json
+    python loadtest.py --mode webhook --users 200
+    python loadtest.py --no-spawn      # bot already running with TELEGRAM_API_URL=http://127.0.0.1:8081
+
+The JSON report has updates/s, per-step latency histograms and the rate of
+messages the bot sent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from fake_telegram import FakeTelegram
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+WEBHOOK_SECRET = "loadtest"
+
+# Each step is (name, action, payload, expect):
+#   "text"  sends payload (formatted with the session's fields) as a message
+#   "click" presses the newest button whose callback_data starts with payload
+#   "wait"  sends nothing; waits for something the bot sends on its own
+# and is complete once a reply containing `expect` arrives (None: any reply).
+SESSIONS = {
+    "power": [
+        ("add", "text", "/add {desc} at {due}", "interval"),
+        ("interval", "click", "interval|", "confirm your task"),
+        ("confirm", "click", "confirm", "Task added"),
+    ],
+    "wizard": [
+        ("start", "text", "/add", "task description"),
+        ("desc", "text", "{desc}", "When is it due"),
+        ("date", "text", "{due_date}", "What time"),
+        ("time", "click", "time|", "Add a topic"),
+        ("topic", "text", "loadtest", "Add a subject"),
+        ("subject", "text", "/skip", "interval"),
+        ("interval", "click", "interval|", "confirm your task"),
+        ("confirm", "click", "confirm", "Task added"),
+    ],
+    "done": [
+        ("list", "text", "/list", None),
+        ("done", "text", "/done {own_task}", "marked done"),
+    ],
+    "reminder": [
+        ("add", "text", "/add {desc} at {soon}", "interval"),
+        ("interval", "click", "interval|0", "confirm your task"),
+        ("confirm", "click", "confirm", "Task added"),
+        ("due", "wait", None, "⏰ Reminder"),
+        ("snooze", "click", "taskact|snooze|", "Snoozed"),
+        ("dismiss", "click", "taskact|dismiss|", "dismissed"),
+    ],
+}
+SESSION_WEIGHTS = {"power": 4, "wizard": 3, "done": 2, "reminder": 1}
+REMINDER_LEAD = 5  # seconds between adding a reminder session's task and its due time
+
+
+class SessionFailed(Exception):
+    pass
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)  # "session.step" -> seconds
+        self.waits = defaultdict(list)  # "wait" steps: not handler time
+        self.failures = Counter()  # "session.step" -> count
+        self.sessions = Counter()
+        self.updates = 0
+
+    def summary(self, samples):
+        samples = sorted(samples)
+        pick = lambda q: round(samples[min(len(samples) - 1, int(len(samples) * q))] * 1000, 2)
+        histogram, i = {}, 0
+        for bound in HISTOGRAM_BUCKETS_MS:
+            n = 0
+            while i < len(samples) and samples[i] * 1000 <= bound:
+                i, n = i + 1, n + 1
+            histogram[f"<={bound}ms"] = n
+        histogram[f">{HISTOGRAM_BUCKETS_MS[-1]}ms"] = len(samples) - i
+        return {
+            "n": len(samples), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99),
+            "max_ms": round(samples[-1] * 1000, 2), "histogram": histogram,
+        }
+
+
+class SimulatedUser:
+    def __init__(self, fake, user_id, stats, timeout, rng):
+        self.fake = fake
+        self.user_id = user_id
+        self.chat_id = user_id  # private chat
+        self.stats = stats
+        self.timeout = timeout
+        self.rng = rng
+        self.replies = fake.subscribe(self.chat_id)
+        self.history = []
+        self.tasks_added = 0
+        self.open_tasks = []  # user_task_ids not yet marked done
+
+    def fields(self):
+        now = datetime.now()
+        due = now + timedelta(days=2, minutes=self.rng.randrange(1440))
+        soon = (now + timedelta(seconds=REMINDER_LEAD)).replace(microsecond=0)
+        return {
+            "desc": f"Load test task {self.tasks_added + 1} for user {self.user_id}",
+            "due": due.strftime("%Y-%m-%d %H:%M"),
+            "due_date": due.strftime("%Y-%m-%d"),
+            "soon": soon.strftime("%Y-%m-%d %H:%M:%S"),
+            "soon_at": time.monotonic() + (soon - now).total_seconds(),
+            "own_task": self.open_tasks[-1] if self.open_tasks else "",
+        }
+
+    def button(self, prefix):
+        for reply in reversed(self.history):
+            for data in reply.buttons:
+                if data.startswith(prefix):
+                    return data, reply.message_id
+        raise SessionFailed(f"no {prefix!r} button")
+
+    async def send(self, action, payload, fields):
+        if action == "text":
+            update = self.fake.text_update(self.chat_id, self.user_id, payload.format(**fields))
+        else:
+            data, message_id = self.button(payload)
+            update = self.fake.callback_update(self.chat_id, self.user_id, data, message_id)
+        self.stats.updates += 1
+        status = await self.fake.deliver(update, WEBHOOK_SECRET)
+        if status != 200:
+            raise SessionFailed(f"webhook answered {status}")
+
+    async def expect(self, fragment, started):
+        deadline = started + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise SessionFailed(f"no reply containing {fragment!r}")
+            try:
+                reply = await asyncio.wait_for(self.replies.get(), remaining)
+            except asyncio.TimeoutError:
+                continue
+            self.history.append(reply)
+            if fragment is None or fragment.lower() in reply.text.lower():
+                return reply.at - started
+
+    async def run_session(self, name):
+        self.history = []
+        fields = self.fields()
+        if name == "done" and not self.open_tasks:
+            name, fields = "power", self.fields()  # nothing to finish yet
+        self.stats.sessions[name] += 1
+        for step, action, payload, expect in SESSIONS[name]:
+            key = f"{name}.{step}"
+            started = time.monotonic()
+            try:
+                if action != "wait":
+                    await self.send(action, payload, fields)
+                elapsed = await self.expect(expect, started)
+            except SessionFailed:
+                self.stats.failures[key] += 1
+                await self.reset()
+                return
+            if action == "wait":
+                # How late the scheduler delivered it, measured from the due time
+                self.stats.waits[key].append(started + elapsed - fields["soon_at"])
+            else:
+                self.stats.latencies[key].append(elapsed)
+            if expect == "Task added":
+                self.tasks_added += 1
+                self.open_tasks.append(self.tasks_added)
+            elif expect == "marked done":
+                self.open_tasks.pop()
+
+    async def reset(self):
+        # Leave any half-finished wizard so the next session starts clean
+        started = time.monotonic()
+        await self.fake.deliver(self.fake.text_update(self.chat_id, self.user_id, "/cancel"), WEBHOOK_SECRET)
+        try:
+            await self.expect("cancelled", started)
+        except SessionFailed:
+            pass
+
+    async def run(self, deadline):
+        await asyncio.sleep(self.rng.uniform(0, 1))  # don't start every user in the same instant
+        names, weights = zip(*SESSION_WEIGHTS.items())
+        while time.monotonic() < deadline:
+            await self.run_session(self.rng.choices(names, weights)[0])
+
+
+def spawn_bot(args, scratch):
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN="0:loadtest",
+        TELEGRAM_API_URL=f"http://127.0.0.1:{args.api_port}",
+        DB_PATH=os.path.join(scratch, "tasks.db"),
+        DEBUG_LOG_JSONL=os.path.join(scratch, "debug_log.jsonl"),
+        BOT_MODE=args.mode,
+    )
+    env.pop("DEV", None)  # no hot-reload wrapper
+    if args.mode == "webhook":
+        env.update(
+            WEBHOOK_SECRET=WEBHOOK_SECRET,
+            WEBHOOK_LISTEN="127.0.0.1",
+            WEBHOOK_PORT=str(args.webhook_port),
+            WEBHOOK_URL=f"http://127.0.0.1:{args.webhook_port}/telegram",
+        )
+    log = open(os.path.join(scratch, "bot.log"), "wb")
+    return subprocess.Popen(
+        [sys.executable, os.path.join(BASE_DIR, "bot.py")], cwd=scratch, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def stop_bot(proc):
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+async def wait_until_ready(fake, args, proc, log_path):
+    deadline = time.monotonic() + args.startup_timeout
+    while not (fake.webhook.get("url") if args.mode == "webhook" else fake.polled.is_set()):
+        if proc is not None and proc.poll() is not None:
+            sys.exit(f"bot exited with status {proc.returncode}; see {log_path}")
+        if time.monotonic() > deadline:
+            sys.exit(f"bot did not connect within {args.startup_timeout:.0f}s" + (f"; see {log_path}" if proc else ""))
+        await asyncio.sleep(0.1)
+
+
+async def run(args):
+    """Run the load test in a scratch directory, removed afterwards unless
+    --keep was given or something went wrong (its bot.log shows what)."""
+    scratch = tempfile.mkdtemp(prefix="taskbot-load-")
+    try:
+        report = await drive_load(args, scratch)
+    except BaseException:
+        print(f"scratch files kept in {scratch}", file=sys.stderr)
+        raise
+    if args.keep or report["throughput"]["failures"]:
+        print(f"scratch files kept in {scratch}", file=sys.stderr)
+    else:
+        shutil.rmtree(scratch, ignore_errors=True)
+        report["meta"]["bot_log"] = None
+    return report
+
+
+async def drive_load(args, scratch):
+    started_at = datetime.now().isoformat(timespec="seconds")
+    log_path = os.path.join(scratch, "bot.log")
+    fake = FakeTelegram()
+    server = await asyncio.start_server(fake.handle, "127.0.0.1", args.api_port)
+    proc = None if args.no_spawn else spawn_bot(args, scratch)
+    async with server:
+        try:
+            await wait_until_ready(fake, args, proc, log_path)
+            stats = Stats()
+            rng = random.Random(args.seed)
+            users = [
+                SimulatedUser(fake, 100000 + i, stats, args.timeout, random.Random(rng.random()))
+                for i in range(args.users)
+            ]
+            sent_before = len(fake.sent)
+            started = time.monotonic()
+            await asyncio.gather(*(user.run(started + args.duration) for user in users))
+            elapsed = time.monotonic() - started
+            sent = Counter(method for _, _, method in fake.sent[sent_before:])
+        finally:
+            # Stop the bot while the fake API is still up to answer its shutdown calls
+            if proc is not None:
+                await asyncio.get_running_loop().run_in_executor(None, stop_bot, proc)
+
+    return {
+        "meta": {
+            "started": started_at,
+            "mode": args.mode,
+            "users": args.users,
+            "duration_s": round(elapsed, 2),
+            "bot_log": log_path if proc else None,
+        },
+        "throughput": {
+            "updates": stats.updates,
+            "updates_per_s": round(stats.updates / elapsed, 1),
+            "sessions": dict(stats.sessions),
+            "failures": dict(stats.failures),
+        },
+        "latency": {key: stats.summary(v) for key, v in sorted(stats.latencies.items())},
+        "waits": {key: stats.summary(v) for key, v in sorted(stats.waits.items())},
+        "sent": {
+            "by_method": dict(sent),
+            "messages_per_s": round(sum(sent.values()) / elapsed, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to start new sessions for")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling")
+    parser.add_argument("--api-port", type=int, default=8081, help="port for the fake Bot API")
+    parser.add_argument("--webhook-port", type=int, default=8443, help="bot webhook port (--mode webhook)")
+    parser.add_argument("--timeout", type=float, default=15, help="seconds to wait for each expected reply")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--no-spawn", action="store_true", help="use a bot that is already running")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true",
+                        help="keep the scratch directory (database, debug log, bot.log) even after a clean run")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Virtual-time replay of TaskBot's reminder scheduler.
+
+Builds (or reopens) a bench.py database, swaps bot.clock for a SimulatedClock
+and then jumps straight from one fire time to the next: each step asks
+next_due_ts() for the earliest pending reminder/question, sets the clock to it
+and runs check_reminders(). A week of reminders replays in seconds.
+
+Every fire is recorded and checked against the schedule each task should
+follow on its own, so the report carries both throughput (fires/s) and
+correctness (missed, duplicate and unexpected fires):
+
+    python simulate.py --tasks 20000 --days 7
+    python simulate.py --db /tmp/bench-1m.db --reuse --days 30 --ack-after 0 --out sim.json
+
+The simulated user marks a task done after --ack-after reminders (0: never),
+so finished tasks drop out of the schedule like they do in real chats.
+Outgoing messages are counted, never sent.
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import sys
+import time
+from collections import Counter, defaultdict
+
+import bench
+
+MAX_SAMPLES = 20  # per problem kind in the report
+
+
+class CountingOutbox:
+    """Stands in for bot.outbox: every message is 'queued' at once."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send_threadsafe(self, chat_id, text, **kwargs):
+        self.sent += 1
+        done = concurrent.futures.Future()
+        done.set_result(None)
+        return done
+
+
+def snapshot_tasks(bot):
+    """Fire state of every active task before the replay starts."""
+    rows = bot.get_db().execute(
+        "SELECT id, question_interval, question_enabled, next_question_ts, next_question_at, "
+        "next_reminder_ts, next_reminder_at FROM tasks WHERE is_done=0"
+    ).fetchall()
+    tasks = {}
+    for tid, qi, qon, q_ts, q_at, r_ts, r_at in rows:
+        tasks[tid] = (qi or 0, qon, q_ts if q_ts is not None else bot.to_epoch(q_at),
+                      r_ts if r_ts is not None else bot.to_epoch(r_at))
+    return tasks
+
+
+def expected_fires(task, start, end, ack_after):
+    """The (kind, scheduled_ts) fires one task should produce between start and end.
+
+    Steps through the task's own fire times following the documented rules
+    (questions only before the due time; the next fire is one interval after
+    the last, or one interval after now if that is already past, so a task
+    that fell behind catches up with a single fire). Nothing from bot.py's
+    scheduling code is reused, so a bug there shows up as a mismatch.
+    """
+    qi, qon, q, r = task
+    bump = qi * 60 if qi > 0 else 60
+
+    def after(last, now):
+        nxt = last + bump
+        return nxt if nxt > now else now + bump
+
+    r = r or start
+    fires, reminders = [], 0
+    while True:
+        due = min(q, r) if qon and q else r
+        now = max(due, start)
+        if now > end:
+            return fires
+        if qon and q and q <= now and r > now:
+            fires.append(("question", q))
+            q = after(q, now)
+        if r <= now:
+            fires.append(("reminder", r))
+            new_r = after(r, now)
+            if qon and q and q <= now:
+                q = new_r
+            r = new_r
+            reminders += 1
+            if ack_after and reminders >= ack_after:
+                return fires
+
+
+def run(bot, args):
+    start = int(time.time())
+    end = start + int(args.days * 86400)
+    tasks = snapshot_tasks(bot)
+    bot.clock = clock = bot.SimulatedClock(start)
+
+    seen = defaultdict(list)  # task_id -> [(kind, scheduled_ts)]
+    reminders = Counter()
+    ticks = idle_ticks = 0
+    started = time.perf_counter()
+    while True:
+        nxt = bot.next_due_ts()
+        if nxt is None or nxt > end:
+            break
+        clock.set(nxt)
+        fires = bot.check_reminders()
+        ticks += 1
+        # A tick that fires nothing leaves next_due_ts where it was; a few in
+        # a row means the schedule is stuck, not just a stale row
+        idle_ticks = 0 if fires else idle_ticks + 1
+        if idle_ticks >= 3:
+            logging.error(f"scheduler stalled at {nxt}: next_due_ts keeps returning a time with nothing due")
+            break
+        for tid, kind, scheduled in fires:
+            seen[tid].append((kind, scheduled))
+            if kind == "reminder":
+                reminders[tid] += 1
+                if args.ack_after and reminders[tid] == args.ack_after:
+                    bot.mark_done(tid, admin=True)
+    wall = time.perf_counter() - started
+
+    problems = {"missed": [], "duplicate": [], "unexpected": []}
+    for tid in tasks.keys() | seen.keys():
+        got = Counter(seen.get(tid, ()))
+        want = Counter(expected_fires(tasks[tid], start, end, args.ack_after)) if tid in tasks else Counter()
+        for fire, n in got.items():
+            if n > 1:
+                problems["duplicate"].append((tid, *fire))
+            if fire not in want:
+                problems["unexpected"].append((tid, *fire))
+        for fire in want.keys() - got.keys():
+            problems["missed"].append((tid, *fire))
+
+    total = sum(len(v) for v in seen.values())
+    return {
+        "virtual_days": args.days,
+        "ticks": ticks,
+        "fires": total,
+        "questions": sum(kind == "question" for v in seen.values() for kind, _ in v),
+        "messages": bot.outbox.sent,
+        "acked": sum(1 for n in reminders.values() if args.ack_after and n >= args.ack_after),
+        "wall_s": round(wall, 3),
+        "fires_per_s": round(total / wall, 1) if wall else None,
+        "ticks_per_s": round(ticks / wall, 1) if wall else None,
+        "stalled": idle_ticks >= 3,
+        **{kind: len(found) for kind, found in problems.items()},
+        "samples": {kind: [{"task": t, "kind": k, "scheduled": s} for t, k, s in sorted(found)[:MAX_SAMPLES]]
+                    for kind, found in problems.items() if found},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    bench.add_dataset_arguments(parser)
+    parser.add_argument("--days", type=float, default=7, help="virtual days to replay")
+    parser.add_argument("--ack-after", type=int, default=3, help="mark a task done after this many reminders (0: never)")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    if args.reuse and not args.db:
+        parser.error("--reuse needs an existing --db")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with bench.open_dataset(args, "taskbot-sim-") as build_s:
+        bot = bench.bot
+        bot.logger.setLevel(logging.WARNING)  # one INFO line per tick adds up over a week
+        bot.outbox = CountingOutbox()
+        report = {"meta": bench.report_meta(args), "dataset": bench.describe_dataset(build_s)}
+        report["simulation"] = run(bot, args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    bad = report["simulation"]
+    return 1 if bad["missed"] or bad["duplicate"] or bad["unexpected"] or bad["stalled"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
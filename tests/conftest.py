@@ -0,0 +1,33 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# bot.py reads its settings, prints and writes debug_log.txt into the cwd on
+# import: point all of it at a scratch directory before the first import.
+SCRATCH = tempfile.mkdtemp(prefix="taskbot-tests-")
+atexit.register(shutil.rmtree, SCRATCH, ignore_errors=True)
+os.environ.setdefault("TELEGRAM_TOKEN", "123:test")
+os.environ["DB_PATH"] = os.path.join(SCRATCH, "tasks.db")
+os.environ["DEBUG_LOG_JSONL"] = os.path.join(SCRATCH, "debug_log.jsonl")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_cwd = os.getcwd()
+os.chdir(SCRATCH)
+try:
+    import bot  # noqa: E402
+finally:
+    os.chdir(_cwd)
+
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, fully migrated database for one test."""
+    monkeypatch.setattr(bot, "DB_PATH", str(tmp_path / "tasks.db"))
+    bot.init_db()
+    yield bot.get_db()
+    bot.close_db()
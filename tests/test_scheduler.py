@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import bot
+
+
+def test_notify_during_next_due_query_is_not_lost(monkeypatch):
+    """A write that commits while next_due_ts() runs must still wake the scheduler."""
+    scheduler = bot.ReminderScheduler()
+    queried = threading.Event()
+    calls = []
+
+    def next_due_ts():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            # MIN() has already read past the new row when its notify() lands
+            scheduler.notify(datetime.fromtimestamp(bot.clock.time() + 3600))
+            time.sleep(0.05)  # let the loop run _maybe_wake before we return
+            return None
+        queried.set()
+        return None
+
+    monkeypatch.setattr(bot, "next_due_ts", next_due_ts)
+
+    async def scenario():
+        scheduler.start()
+        # As right after a tick: the previous wakeup is in the past
+        scheduler._next_at = bot.clock.time() - 5
+        try:
+            for _ in range(100):
+                if queried.is_set():
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert queried.is_set(), "scheduler slept through a notify that arrived during next_due_ts()"